@@ -22,8 +22,10 @@ from src.generators.script import ScriptGenerator
 from src.generators.audio import AudioGenerator
 from src.generators.image import ImageGenerator
 from src.video.composer import VideoCompositor
+from src.utils.bgm import get_bgm_library
+from src.utils.cleanup import cleanup_stale_workspaces
 from src.utils.config import Config
-from src.utils.cleanup import cleanup_temp
+from src.utils.context import JobContext
 from src.utils.logger import logger
 
 # Configure Streamlit page
@@ -87,6 +89,12 @@ def get_random_topic():
     ]
     return random.choice(topics)
 
+# BGM index: decoded/normalized once per track and shared by every session of this process
+with st.spinner("Indexing background music..."):
+    bgm_library = get_bgm_library(Config.BGM_DIR)
+    # Picks up tracks copied into assets/bgm since the last rerun (unchanged files are only stat()ed)
+    bgm_library.refresh()
+
 # Initialize session state for topic
 if 'topic_input' not in st.session_state:
     st.session_state.topic_input = ""
@@ -137,20 +145,24 @@ with st.sidebar:
             bgm_save_path = Config.BGM_DIR / uploaded_bgm.name
             with open(bgm_save_path, "wb") as f:
                 f.write(uploaded_bgm.getbuffer())
-            st.success(f"Saved: {uploaded_bgm.name}")
+            # Index right away so the first render with it doesn't pay for decoding
+            try:
+                bgm_library.add(bgm_save_path)
+                st.success(f"Saved: {uploaded_bgm.name}")
+            except (OSError, ValueError) as e:
+                st.error(f"Could not read {uploaded_bgm.name}: {e}")
     
-    # List available BGM files (refresh list)
-    bgm_files = list(Config.BGM_DIR.glob("*.mp3"))
-    bgm_options = ["Random"] + [f.name for f in bgm_files]
+    # List available BGM files (refresh list); durations come from the BGM index
+    bgm_durations = {track["name"]: track["duration_us"] / 1_000_000 for track in bgm_library.tracks()}
+    bgm_options = ["Random"] + list(bgm_durations)
     
-    selected_bgm = st.selectbox("Select BGM Track", bgm_options, disabled=not enable_bgm)
+    selected_bgm = st.selectbox(
+        "Select BGM Track", bgm_options, disabled=not enable_bgm,
+        format_func=lambda name: f"{name} ({int(bgm_durations[name]) // 60}:{int(bgm_durations[name]) % 60:02d})" if name in bgm_durations else name
+    )
     bgm_volume = st.slider("BGM Volume", 0.0, 1.0, Config.BGM_VOLUME, 0.05, disabled=not enable_bgm)
-    
-    # Update Config based on UI
-    Config.ENABLE_BGM = enable_bgm
-    Config.BGM_VOLUME = bgm_volume
 
-async def generate_video_flow(topic_input, bgm_file_path=None):
+async def generate_video_flow(topic_input, context: JobContext, bgm_file_path=None):
     # Use a clean container for status
     status_container = st.container()
     
@@ -163,15 +175,13 @@ async def generate_video_flow(topic_input, bgm_file_path=None):
         progress_bar.progress(prog)
     
     try:
-        cleanup_temp()
-        
         # 1. Script
         update_status("✍️ Writing the Horror Story...", 10)
         
         if not topic_input:
             topic_input = None
             
-        script_gen = ScriptGenerator()
+        script_gen = ScriptGenerator(context=context)
         scenes = await script_gen.generate_script(topic_input)
         
         # Display Script Preview
@@ -182,31 +192,22 @@ async def generate_video_flow(topic_input, bgm_file_path=None):
 
         # Save script to output
         import json
-        script_path = Config.OUTPUT_DIR / "script.json"
+        script_path = context.output_dir / f"script_{context.job_id}.json"
         with open(script_path, "w", encoding="utf-8") as f:
             json.dump(scenes, f, indent=4)
         
         # 2. Assets
-        audio_gen = AudioGenerator()
-        image_gen = ImageGenerator()
+        audio_gen = AudioGenerator(context=context)
+        image_gen = ImageGenerator(context=context)
         
-        # Generate per-scene audio for perfect synchronization
+        # One narration request for all scenes; exact per-scene offsets come from its word timings
         update_status("🎙️ Generating Scene Narration...", 30)
         
-        from moviepy.editor import AudioFileClip
-        
-        for i, scene in enumerate(scenes):
-            prog = 30 + int(5 * (i / len(scenes)))
-            update_status(f"🎙️ Generating Audio ({i+1}/{len(scenes)})...", prog)
-            
-            # Generate audio for this specific scene
-            audio_path = await audio_gen.generate_voiceover(scene['text'], i)
-            
-            # Get exact duration from the audio file
-            audio_clip = AudioFileClip(audio_path)
-            scene['audio'] = audio_path
-            scene['duration'] = audio_clip.duration
-            audio_clip.close()
+        narration_path, scene_timings = await audio_gen.generate_scene_narration([scene['text'] for scene in scenes])
+        for scene, timing in zip(scenes, scene_timings):
+            scene['start'] = timing['start']
+            scene['duration'] = timing['duration']
+            scene['words'] = timing['words']
         
         # Generate Images
         update_status("🎨 Generating Visuals...", 35)
@@ -216,43 +217,65 @@ async def generate_video_flow(topic_input, bgm_file_path=None):
         
         # Create a grid for images
         image_cols = st.columns(4)
+        image_paths = {}
         
-        for i, scene in enumerate(scenes):
-            prog = 35 + int(55 * (i / total_scenes))
-            update_status(f"🎨 Generating Visuals ({i+1}/{total_scenes})...", prog)
-            
-            image_path = await image_gen.generate_image(scene['image_prompt'], i)
-            
-            processed_scenes.append({
-                "text": scene['text'],
-                "image": image_path,
-                "audio": scene['audio'],
-                "duration": scene['duration']
-            })
+        # Images are fetched concurrently and arrive in completion order
+        async for i, image_path in image_gen.generate_images([scene['image_prompt'] for scene in scenes]):
+            image_paths[i] = image_path
+            prog = 35 + int(55 * (len(image_paths) / total_scenes))
+            update_status(f"🎨 Generating Visuals ({len(image_paths)}/{total_scenes})...", prog)
             
             # Show image in grid
             col_idx = i % 4
             with image_cols[col_idx]:
                 st.image(image_path, caption=f"Scene {i+1}", width="stretch")
-
-        # 3. Assembly
-        update_status("🎬 Assembling Final Video (Applying Vignette & Captions)...", 90)
-        compositor = VideoCompositor()
         
-        output_file = compositor.assemble_video(
-            processed_scenes,
-            specific_bgm_path=str(bgm_file_path) if bgm_file_path else None
-        )
+        for i, scene in enumerate(scenes):
+            processed_scenes.append({
+                "text": scene['text'],
+                "image": image_paths[i],
+                "start": scene['start'],
+                "duration": scene['duration'],
+                "words": scene['words']
+            })
+
+        job = {
+            "context": context,
+            "scenes": processed_scenes,
+            "narration_path": narration_path,
+            # Resolved once so the draft and the final render use the same track
+            "bgm_path": VideoCompositor(context=context).pick_bgm(bgm_file_path),
+            "draft_path": None,
+            "final_path": None,
+        }
+
+        # 3. Draft preview (the final render reuses these scenes, narration and soundtrack)
+        update_status("🎬 Rendering Draft Preview...", 90)
+        job["draft_path"] = render_job(job, draft=True)
         
-        update_status("✅ Generation Complete!", 100)
-        return output_file
+        update_status("✅ Draft Ready!", 100)
+        return job
         
     except Exception as e:
         status_text.error(f"❌ Error: {str(e)}")
         logger.exception("Streamlit generation error")
+        # Only this session's workspace; other sessions may be rendering right now
+        context.cleanup()
         return None
-    finally:
-        cleanup_temp()
+
+def render_job(job: dict, draft: bool = False) -> str:
+    """
+    Renders a generated job: a low-resolution draft preview or the full-quality video.
+    """
+    context = job["context"].as_draft() if draft else job["context"]
+    compositor = VideoCompositor(context=context)
+    suffix = "_draft" if draft else ""
+    return compositor.assemble_video(
+        job["scenes"],
+        output_filename=f"horror_{context.job_id}{suffix}.mp4",
+        specific_bgm_path=str(job["bgm_path"]) if job["bgm_path"] else None,
+        master_audio_path=job["narration_path"]
+    )
 
 if st.button("🎥 Generate Horror Video"):
     # Check keys if needed (disabled for g4f mode)
@@ -261,20 +284,51 @@ if st.button("🎥 Generate Horror Video"):
     else:
         # Resolve BGM Path
         selected_bgm_path = None
-        if Config.ENABLE_BGM and selected_bgm != "Random":
+        if enable_bgm and selected_bgm != "Random":
             selected_bgm_path = Config.BGM_DIR / selected_bgm
+
+        # The previous job's scenes are no longer needed once a new one starts
+        previous_job = st.session_state.pop("job", None)
+        if previous_job:
+            previous_job["context"].cleanup()
+
+        # Workspaces of sessions that were closed before rendering the final video
+        cleanup_stale_workspaces()
+
+        # Settings of this run only; never written back to the shared Config class
+        context = JobContext.create(enable_bgm=enable_bgm, bgm_volume=bgm_volume)
             
         with st.spinner("Summoning the spirits..."):
-            output_video_path = asyncio.run(generate_video_flow(st.session_state.topic_input, selected_bgm_path))
-            
-            if output_video_path:
-                st.success("Your nightmare is ready.")
-                st.video(output_video_path)
-                
-                with open(output_video_path, "rb") as file:
-                    st.download_button(
-                        label="⬇️ Download Video",
-                        data=file,
-                        file_name="horror_story.mp4",
-                        mime="video/mp4"
-                    )
+            job = asyncio.run(generate_video_flow(st.session_state.topic_input, context, selected_bgm_path))
+            if job:
+                st.session_state.job = job
+
+# Kept in the session across reruns, so "Render Final" only pays for the full-quality pass
+job = st.session_state.get("job")
+if job:
+    if job["final_path"] is None:
+        st.info(f"Draft preview ({Config.DRAFT_WIDTH}x{Config.DRAFT_HEIGHT}, {Config.DRAFT_FPS} fps, simplified effects).")
+        st.video(job["draft_path"])
+
+        if st.button("🎞️ Render Final Video"):
+            with st.spinner("Rendering the full-quality video..."):
+                try:
+                    job["final_path"] = render_job(job)
+                except Exception as e:
+                    st.error(f"❌ Error: {str(e)}")
+                    logger.exception("Streamlit final render error")
+                else:
+                    # Scenes are not needed anymore; only this session's workspace is removed
+                    job["context"].cleanup()
+                    st.rerun()
+    else:
+        st.success("Your nightmare is ready.")
+        st.video(job["final_path"])
+        
+        with open(job["final_path"], "rb") as file:
+            st.download_button(
+                label="⬇️ Download Video",
+                data=file,
+                file_name="horror_story.mp4",
+                mime="video/mp4"
+            )
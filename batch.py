@@ -0,0 +1,172 @@
+"""
+Batch mode: generate many videos without any prompts.
+
+Usage:
+    python batch.py --topics topics.txt
+    python batch.py --count 10 --network-jobs 4 --render-jobs 2
+    python batch.py --resume 20250101_120000
+
+Each job runs the network stage (script, narration, images) under one concurrency limit
+and the CPU-bound render stage under another, so downloads for the next videos overlap
+with encoding of the previous ones. A summary with per-job timings and output paths is
+written to output/batch/<batch_id>/summary.json. Every job is checkpointed under
+output/jobs/<batch_id>_<job>, so --resume reruns only the unfinished jobs of a batch and
+each of them only redoes its missing stages.
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import PIL.Image
+
+# Monkey patch for moviepy compatibility with newer Pillow versions
+try:
+    if not hasattr(PIL.Image, 'ANTIALIAS'):
+        PIL.Image.ANTIALIAS = PIL.Image.LANCZOS
+except AttributeError:
+    pass
+
+from src.generators.script import ScriptGenerator
+from src.pipeline import generate_assets, render_video
+from src.utils.config import Config
+from src.utils.logger import logger
+from src.utils.manifest import JobManifest
+
+def read_topics(path: str) -> list[str]:
+    """
+    One topic per line; blank lines and lines starting with '#' are ignored.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.strip().startswith("#")]
+
+async def resolve_topics(args) -> list[str]:
+    if args.topics:
+        return read_topics(args.topics)
+
+    logger.info(f"Generating {args.count} viral topics...")
+    script_gen = ScriptGenerator()
+    # Same limit as the network stage of the jobs: never more than --network-jobs LLM calls at once
+    slots = asyncio.Semaphore(args.network_jobs)
+
+    async def viral_topic():
+        async with slots:
+            return await script_gen.generate_viral_topic()
+
+    return list(await asyncio.gather(*[viral_topic() for _ in range(args.count)]))
+
+class BatchRunner:
+    def __init__(self, batch_id: str, network_jobs: int, render_jobs: int):
+        self.batch_id = batch_id
+        self.batch_dir = Config.OUTPUT_DIR / "batch" / batch_id
+        self.batch_dir.mkdir(parents=True, exist_ok=True)
+        self.network_slots = asyncio.Semaphore(network_jobs)
+        # Renders spend their time in numpy/PIL/ffmpeg; threads keep the segments backend's own
+        # process pool usable from inside a job
+        self.render_pool = ThreadPoolExecutor(max_workers=render_jobs)
+        self.jobs = []
+
+    def load_summary(self) -> list[dict]:
+        with open(self.batch_dir / "summary.json", "r", encoding="utf-8") as f:
+            return json.load(f)["jobs"]
+
+    def save_summary(self):
+        summary = {"batch": self.batch_id, "jobs": self.jobs}
+        with open(self.batch_dir / "summary.json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=4)
+
+    async def run_job(self, job_id: str, topic: str, record: dict = None):
+        if record is None:
+            record = {"job": job_id, "topic": topic, "status": "queued", "output": None, "timings": {}}
+            self.jobs.append(record)
+        record.update(status="queued", output=None, timings={})
+        record.pop("error", None)
+        started = time.perf_counter()
+
+        try:
+            job = JobManifest.open(f"{self.batch_id}_{job_id}", topic)
+            async with self.network_slots:
+                record["status"] = "generating"
+                assets = await generate_assets(
+                    job,
+                    script_path=self.batch_dir / f"{job_id}_script.json",
+                    report=lambda message: logger.info(f"[{job_id}] {message}")
+                )
+            record["timings"].update(assets["timings"])
+            record["scenes"] = len(assets["scenes"])
+
+            # Network slot is released here, so the next job downloads while this one renders
+            record["status"] = "rendering"
+            render_start = time.perf_counter()
+            output_filename = str((self.batch_dir / f"{job_id}.mp4").relative_to(Config.OUTPUT_DIR))
+            loop = asyncio.get_running_loop()
+            record["output"] = await loop.run_in_executor(self.render_pool, render_video, assets, output_filename)
+            record["timings"]["render"] = time.perf_counter() - render_start
+            record["status"] = "done"
+        except Exception as e:
+            logger.exception(f"[{job_id}] failed")
+            record["status"] = "failed"
+            record["error"] = str(e)
+        finally:
+            record["timings"]["total"] = time.perf_counter() - started
+            self.save_summary()
+
+    async def run(self, topics: list[str]):
+        try:
+            await asyncio.gather(*[self.run_job(f"job_{i + 1:03d}", topic) for i, topic in enumerate(topics)])
+        finally:
+            self.render_pool.shutdown(wait=True)
+            self.save_summary()
+
+    async def resume(self):
+        """
+        Reruns every job of a previous run of this batch that did not finish.
+        """
+        self.jobs = self.load_summary()
+        pending = [record for record in self.jobs if record["status"] != "done"]
+        logger.info(f"Resuming batch {self.batch_id}: {len(pending)}/{len(self.jobs)} jobs unfinished.")
+        try:
+            await asyncio.gather(*[self.run_job(record["job"], record["topic"], record) for record in pending])
+        finally:
+            self.render_pool.shutdown(wait=True)
+            self.save_summary()
+
+async def main():
+    parser = argparse.ArgumentParser(description="Generate many horror videos non-interactively.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--topics", help="Text file with one topic per line")
+    source.add_argument("--count", type=int, help="Number of videos, with AI-generated topics")
+    source.add_argument("--resume", metavar="BATCH_ID", help="Rerun the unfinished jobs of a previous batch")
+    parser.add_argument("--network-jobs", type=int, default=3, help="Jobs generating script/audio/images at once")
+    parser.add_argument("--render-jobs", type=int, default=1, help="Jobs rendering video at once")
+    args = parser.parse_args()
+
+    if args.resume:
+        runner = BatchRunner(args.resume, args.network_jobs, args.render_jobs)
+        print(f"\n\033[91m=== RESUMING BATCH {args.resume} ===\033[0m")
+        await runner.resume()
+    else:
+        topics = await resolve_topics(args)
+        if not topics:
+            print("[!] No topics to process.")
+            return 1
+
+        batch_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        runner = BatchRunner(batch_id, args.network_jobs, args.render_jobs)
+        print(f"\n\033[91m=== BATCH {batch_id}: {len(topics)} videos ===\033[0m")
+        await runner.run(topics)
+
+    failed = 0
+    for record in runner.jobs:
+        status = record["status"]
+        failed += status != "done"
+        print(f"  {record['job']}  {status:<7} {record['timings'].get('total', 0):7.1f}s  {record['output'] or record.get('error', '')}")
+    print(f"\n\033[92m[DONE]\033[0m Summary: {runner.batch_dir / 'summary.json'}\n")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    if sys.platform == 'win32':
+        asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,81 @@
+"""
+Micro-benchmark: captions rendered per second by TextEngine.
+
+Compares the previous renderer (font reloaded per caption, outline drawn as
+(2*stroke_width+1)^2 offset draws) with the cached/native-stroke one, cold and warm.
+
+Usage:
+    python bench_captions.py [--rounds 3]
+"""
+import argparse
+import sys
+import textwrap
+import time
+from PIL import Image, ImageDraw, ImageFont
+from src.video.text import TextEngine, load_font
+
+SAMPLE = (
+    "I heard the scratching again at exactly three in the morning. "
+    "It came from inside the wall behind my bed, slow and patient. "
+    "When I pressed my ear against the plaster, something pressed back. "
+    "The landlord swore nobody had lived in the apartment next door for years."
+)
+
+def old_render(engine, text, max_width):
+    # Previous TextEngine._create_pil_text_image, condensed
+    try:
+        font = ImageFont.truetype(engine.font_path, engine.fontsize)
+    except IOError:
+        font = ImageFont.load_default()
+    wrap_width = max(10, int(max_width / (engine.fontsize * 0.5)))
+    lines = textwrap.wrap(text, width=wrap_width)
+    boxes = [font.getbbox(line) for line in lines]
+    line_spacing = int(engine.fontsize * 0.2)
+    total_height = sum(b[3] - b[1] for b in boxes) + (len(lines) - 1) * line_spacing + 40
+    img_width = max(max_width, max((b[2] - b[0] for b in boxes), default=0) + 40)
+    img = Image.new('RGBA', (img_width, total_height), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(img)
+    y = 20
+    for line, bbox in zip(lines, boxes):
+        x = (img_width - (bbox[2] - bbox[0])) // 2
+        draw.text((x + 6, y + 6), line, font=font, fill="black")
+        for dx in range(-engine.stroke_width, engine.stroke_width + 1):
+            for dy in range(-engine.stroke_width, engine.stroke_width + 1):
+                draw.text((x + dx, y + dy), line, font=font, fill=engine.stroke_color)
+        draw.text((x, y), line, font=font, fill=engine.color)
+        y += bbox[3] - bbox[1] + line_spacing
+    return img
+
+def rate(fn, chunks, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for chunk in chunks:
+            fn(chunk)
+    return rounds * len(chunks) / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    engine = TextEngine()
+    max_width = 930
+    chunks = engine.split_text_into_chunks(SAMPLE, max_words=5)
+
+    old_rate = rate(lambda c: old_render(engine, c, max_width), chunks, args.rounds)
+
+    # Cold: no font or bitmap cache, one pass
+    load_font.cache_clear()
+    TextEngine._bitmap_cache.clear()
+    cold_rate = rate(lambda c: engine.render_caption(c, max_width), chunks, 1)
+
+    # Warm: every caption already rendered (re-renders, repeated phrases)
+    warm_rate = rate(lambda c: engine.render_caption(c, max_width), chunks, args.rounds)
+
+    print(f"Captions: {len(chunks)} chunks x {args.rounds} rounds, font: {engine.font_path}")
+    print(f"Old renderer:          {old_rate:10.1f} captions/sec")
+    print(f"New renderer (cold):   {cold_rate:10.1f} captions/sec")
+    print(f"New renderer (cached): {warm_rate:10.1f} captions/sec")
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,3 +1,4 @@
+import argparse
 import asyncio
 import sys
 import PIL.Image
@@ -10,128 +11,65 @@ try:
 except AttributeError:
     pass
 
-from src.generators.script import ScriptGenerator
-from src.generators.audio import AudioGenerator
-from src.generators.image import ImageGenerator
-from src.video.composer import VideoCompositor
+from src.pipeline import generate_and_render, generate_assets, render_video
+from src.utils.config import Config
 from src.utils.logger import logger
-from src.utils.cleanup import cleanup_temp
+from src.utils.manifest import JobManifest
 
 async def main():
+    parser = argparse.ArgumentParser(description="Generate a horror video.")
+    parser.add_argument("--topic", help="Story topic (prompted for when omitted)")
+    parser.add_argument("--resume", metavar="JOB_ID", help="Continue an interrupted job, reusing its finished stages")
+    parser.add_argument("--refresh-prompts", action="store_true",
+                        help="With LLM_CACHE_ENABLED=1: reuse a cached story but ask for new image prompts")
+    args = parser.parse_args()
+
+    job = None
     try:
-        cleanup_temp()
-        
         print("\n\033[91m=== AI HORROR VIDEO GENERATOR ===\033[0m")
-        topic = input("\nEnter Topic (or Press Enter for Random): ").strip()
-
-        # 1. Generate Script
-        print("\n\033[93m[1/3] Generating Story...\033[0m")
-        script_gen = ScriptGenerator()
-        scenes = await script_gen.generate_script(topic)
-        print(f"      > Created {len(scenes)} scenes.")
+        if args.resume:
+            job = JobManifest.load(args.resume)
+            print(f"\nResuming job {job.job_id}: {job.topic or '(random topic)'}")
+        else:
+            topic = args.topic if args.topic is not None else input("\nEnter Topic (or Press Enter for Random): ").strip()
+            job = JobManifest.create(topic)
+            print(f"\nJob {job.job_id}")
 
-        # Save script to file
-        import json
-        from src.utils.config import Config
-        script_path = Config.OUTPUT_DIR / "script.json"
-        with open(script_path, "w", encoding="utf-8") as f:
-            json.dump(scenes, f, indent=4)
-        
-        # 2. Generate Assets (Audio & Images)
-        print("\n\033[93m[2/3] Generating Assets...\033[0m")
-        audio_gen = AudioGenerator()
-        image_gen = ImageGenerator()
-        
-        # A. Continuous Audio Generation
-        print("      > Generating Narration & VTT...")
-        full_script_text = " ".join([s['text'] for s in scenes])
-        audio_path, vtt_path = await audio_gen.generate_full_narration(full_script_text, filename="story_narration")
-        
-        # B. Parse VTT to get EXACT timings for each scene
-        import webvtt
-        
-        print("      > Syncing Audio...")
-        vtt = webvtt.read(vtt_path)
-        all_cues = list(vtt)
-        
-        current_cue_idx = 0
-        total_cues = len(all_cues)
-        
-        def normalize(s):
-            return "".join(c.lower() for c in s if c.isalnum())
-            
-        def vtt_to_sec(t_str):
-            h, m, s = t_str.split(':')
-            return float(h) * 3600 + float(m) * 60 + float(s)
-
-        for i, scene in enumerate(scenes):
-            scene_text = scene['text']
-            
-            # Simple greedy matcher
-            start_time_sec = 0
-            end_time_sec = 3.0
-            
-            if current_cue_idx < total_cues:
-                accumulated_text = ""
-                scene_text_norm = normalize(scene_text)
-
-                # Use the start time of the first cue we consume, and keep accumulating
-                # cues until the normalized scene text is found within the accumulated text.
-                while current_cue_idx < total_cues:
-                    cue = all_cues[current_cue_idx]
-                    cue_text = cue.text
-
-                    # set start at the first consumed cue
-                    if accumulated_text == "":
-                        start_time_sec = vtt_to_sec(cue.start)
-
-                    # add a space to keep words separated when concatenating cues
-                    accumulated_text = (accumulated_text + " " + cue_text).strip()
-                    accum_norm = normalize(accumulated_text)
-
-                    # If the scene text appears anywhere in the accumulated cues, we consider it matched.
-                    if scene_text_norm in accum_norm or len(accum_norm) >= len(scene_text_norm):
-                        end_time_sec = vtt_to_sec(cue.end)
-                        current_cue_idx += 1
-                        break
-
-                    current_cue_idx += 1
-                
-                # Check bounds
-                if i == len(scenes) - 1: end_time_sec = vtt_to_sec(all_cues[-1].end)
-                duration = max(1.0, end_time_sec - start_time_sec)
-                scene['duration'] = duration
-            else:
-                scene['duration'] = 3.0
-
-        processed_scenes = []
-        
-        # C. Generate Images (Sequential)
-        print(f"      > Generating {len(scenes)} Cinematic Images...")
-        for i, scene in enumerate(scenes):
-            # Print minimal progress on same line if possible, or simple dots
-            # print(f"\r      > Image {i+1}/{len(scenes)}", end="")
-            processed_scenes.append({
-                "text": scene['text'],
-                "image": await image_gen.generate_image(scene['image_prompt'], i),
-                "duration": scene['duration']
-            })
-        print("") # Newline
+        report = lambda message: print(f"      > {message}")
+        if Config.PIPELINED_RENDER and Config.RENDER_BACKEND == "segments":
+            # Scenes are encoded as soon as their image and timing exist, while the rest download
+            print("\n\033[93m[1/1] Generating Story & Assets while Rendering...\033[0m")
+            assets, output_file = await generate_and_render(
+                job,
+                script_path=Config.OUTPUT_DIR / "script.json",
+                report=report,
+                refresh_prompts=args.refresh_prompts
+            )
+        else:
+            # 1. Generate Script & Assets (story is streamed; images start while it is being written)
+            print("\n\033[93m[1/2] Generating Story & Assets...\033[0m")
+            assets = await generate_assets(
+                job,
+                script_path=Config.OUTPUT_DIR / "script.json",
+                report=report,
+                refresh_prompts=args.refresh_prompts
+            )
 
-        # 3. Assemble Video
-        print("\n\033[93m[3/3] Assembling Video...\033[0m")
-        compositor = VideoCompositor()
-        output_file = compositor.assemble_video(processed_scenes, master_audio_path=audio_path)
+            # 2. Assemble Video
+            print("\n\033[93m[2/2] Assembling Video...\033[0m")
+            output_file = render_video(assets)
         
         print(f"\n\033[92m[DONE] Video saved:\033[0m {output_file}\n")
         
     except KeyboardInterrupt:
         print("\n[!] Cancelled.")
+        if job:
+            print(f"    Continue with: python main.py --resume {job.job_id}")
     except Exception as e:
         logger.exception("Error:")
         print(f"\n[!] Error: {e}")
-    finally:
-        cleanup_temp()
+        if job:
+            print(f"    Continue with: python main.py --resume {job.job_id}")
 
 if __name__ == "__main__":
     if sys.platform == 'win32':
@@ -1,14 +1,80 @@
 import edge_tts
 import asyncio
+import shutil
 from pathlib import Path
+from ..utils.alignment import align_scenes
+from ..utils.audio_probe import audio_duration
+from ..utils.cache import DiskCache
 from ..utils.config import Config
+from ..utils.context import JobContext
 from ..utils.logger import logger
 
 class AudioGenerator:
-    def __init__(self):
-        self.voice = Config.TTS_VOICE
-        self.output_dir = Config.TEMP_DIR
+    def __init__(self, context: JobContext = None):
+        self.context = context or JobContext.default()
+        self.voice = self.context.tts_voice
+        self.rate = self.context.tts_rate
+        self.pitch = self.context.tts_pitch
+        self.output_dir = self.context.workspace
         self.output_dir.mkdir(parents=True, exist_ok=True)
+        # Synthesized MP3s keyed on (text, voice, rate, pitch), stored with their WordBoundary events
+        self.cache = None
+        if Config.TTS_CACHE_ENABLED:
+            self.cache = DiskCache("tts", max_bytes=Config.TTS_CACHE_MAX_MB * 1024 * 1024, suffix=".mp3")
+
+    def _communicate(self, text: str) -> edge_tts.Communicate:
+        try:
+            # Newer edge-tts versions only emit WordBoundary events when asked to
+            return edge_tts.Communicate(text, self.voice, rate=self.rate, pitch=self.pitch, boundary="WordBoundary")
+        except TypeError:
+            return edge_tts.Communicate(text, self.voice, rate=self.rate, pitch=self.pitch)
+
+    async def _synthesize(self, text: str, output_file: Path) -> list[dict]:
+        """
+        Streams speech for `text` into `output_file`, serving it from the TTS cache when possible.
+        Returns the WordBoundary events as dicts (offset/duration in 100ns ticks, text).
+        """
+        key = None
+        if self.cache:
+            key = DiskCache.make_key(text, self.voice, self.rate, self.pitch)
+            metas = {}
+
+            def has_boundaries(key, path):
+                # An mp3 without readable word boundaries is a miss: it is resynthesized and re-stored
+                meta = self.cache.get_meta(key)
+                if not isinstance(meta, dict) or not isinstance(meta.get("word_boundaries"), list):
+                    return False
+                metas[key] = meta
+                return True
+
+            cached = self.cache.get(key, valid=has_boundaries)
+            if cached:
+                shutil.copyfile(cached, output_file)
+                logger.info(f"TTS cache hit: {output_file}")
+                return metas[key]["word_boundaries"]
+
+        word_boundaries = []
+        communicate = self._communicate(text)
+        with open(output_file, "wb") as file:
+            async for chunk in communicate.stream():
+                if chunk["type"] == "audio":
+                    file.write(chunk["data"])
+                elif chunk["type"] == "WordBoundary":
+                    word_boundaries.append({
+                        "offset": chunk["offset"],
+                        "duration": chunk["duration"],
+                        "text": chunk["text"],
+                    })
+
+        if self.cache:
+            self.cache.put_file(key, output_file, meta={"word_boundaries": word_boundaries})
+        return word_boundaries
+
+    def duration(self, audio_path) -> float:
+        """
+        Exact duration (seconds) of a generated MP3, read from its frame headers.
+        """
+        return audio_duration(audio_path)
 
     async def generate_voiceover(self, text: str, index: int) -> str:
         """
@@ -16,50 +82,73 @@ class AudioGenerator:
         Returns the absolute path to the audio file.
         """
         output_file = self.output_dir / f"scene_{index}.mp3"
-        
+
         try:
-            communicate = edge_tts.Communicate(text, self.voice)
-            await communicate.save(str(output_file))
+            await self._synthesize(text, output_file)
             logger.info(f"Generated audio for scene {index}: {output_file}")
             return str(output_file)
         except Exception as e:
             logger.error(f"Audio generation failed for scene {index}: {e}")
             raise e
 
+    async def generate_narration(self, text: str, filename="full_audio") -> tuple[str, list[dict]]:
+        """
+        Generates audio for the entire script text.
+        Returns (audio_path, word_boundaries) where each boundary is a WordBoundary event
+        {"offset", "duration", "text"} (100ns ticks), ready for utils.alignment.
+        """
+        audio_path = self.output_dir / f"{filename}.mp3"
+
+        try:
+            word_boundaries = await self._synthesize(text, audio_path)
+            logger.info(f"Generated full narration: {audio_path} ({len(word_boundaries)} words)")
+            return str(audio_path), word_boundaries
+        except Exception as e:
+            logger.error(f"Full narration generation failed: {e}")
+            raise e
+
+    async def generate_scene_narration(self, texts: list[str], filename="scene_narration") -> tuple[str, list[dict]]:
+        """
+        Synthesizes all scene texts in one streamed request (one connection instead of one per
+        scene) and splits it by the WordBoundary offsets.
+        Returns (audio_path, scenes) where scenes[i] is {"start", "end", "duration", "words"}:
+        the scene's offsets (seconds) into the single narration file and its spoken words.
+        """
+        audio_path, word_boundaries = await self.generate_narration(" ".join(texts), filename)
+        # The last scene runs to the real end of the audio (trailing silence included)
+        scenes = align_scenes(texts, word_boundaries, total_duration=self.duration(audio_path))
+        for scene in scenes:
+            scene["duration"] = scene["end"] - scene["start"]
+        return audio_path, scenes
+
     async def generate_full_narration(self, text: str, filename="full_audio") -> tuple[str, str]:
         """
         Generates audio for the entire script text.
         Returns (audio_path, vtt_path).
         """
-        audio_path = self.output_dir / f"{filename}.mp3"
         vtt_path = self.output_dir / f"{filename}.vtt"
-        
+
         try:
-            communicate = edge_tts.Communicate(text, self.voice)
+            audio_path, word_boundaries = await self.generate_narration(text, filename)
+
             submaker = edge_tts.SubMaker()
-            
-            with open(audio_path, "wb") as file:
-                async for chunk in communicate.stream():
-                    if chunk["type"] == "audio":
-                        file.write(chunk["data"])
-                    elif chunk["type"] == "WordBoundary":
-                        submaker.feed(chunk)
-                        
+            for boundary in word_boundaries:
+                submaker.feed({"type": "WordBoundary", **boundary})
+
             with open(vtt_path, "w", encoding="utf-8") as file:
                 # SubMaker only supports get_srt() in 7.x
                 srt_content = submaker.get_srt()
-                
+
                 # Convert SRT to VTT
                 # 1. Add Header
                 vtt_content = "WEBVTT\n\n" + srt_content
                 # 2. Convert timestamps (00:00:00,000 -> 00:00:00.000)
                 vtt_content = vtt_content.replace(",", ".")
-                
+
                 file.write(vtt_content)
-                
-            logger.info(f"Generated full narration: {audio_path}")
-            return str(audio_path), str(vtt_path)
-            
+
+            return audio_path, str(vtt_path)
+
         except Exception as e:
             logger.error(f"Full narration generation failed: {e}")
             raise e
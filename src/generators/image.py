@@ -2,21 +2,144 @@ import aiohttp
 import asyncio
 from pathlib import Path
 import os
+import shutil
+from ..utils.cache import DiskCache
 from ..utils.config import Config
+from ..utils.context import JobContext
 from ..utils.logger import logger
 
 class ImageGenerator:
-    def __init__(self):
-        self.output_dir = Config.TEMP_DIR
+    def __init__(self, concurrency: int = None, context: JobContext = None):
+        self.context = context or JobContext.default()
+        self.output_dir = self.context.workspace
         self.output_dir.mkdir(parents=True, exist_ok=True)
-        self.width = Config.VIDEO_WIDTH
-        self.height = Config.VIDEO_HEIGHT
+        self.width = self.context.width
+        self.height = self.context.height
+        # Max number of scenes fetched at the same time by generate_images()
+        self.concurrency = concurrency or self.context.image_concurrency
+        # Downloaded images keyed on (prompt, size, seed, model); hits skip the network entirely
+        self.cache = None
+        if Config.IMAGE_CACHE_ENABLED:
+            self.cache = DiskCache("images", max_bytes=Config.IMAGE_CACHE_MAX_MB * 1024 * 1024, suffix=".jpg")
+        # Scene indices whose download failed and got a black placeholder instead
+        self.placeholders = set()
+        # Models to try in order of preference
+        self.models = ["flux", "turbo", None] # None means default model
+        self.headers = {
+            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+        }
+
+    def _create_session(self, limit: int = None) -> aiohttp.ClientSession:
+        """
+        Creates a keep-alive session whose connection pool is shared by every request of a job.
+        """
+        connector = aiohttp.TCPConnector(limit=limit or self.concurrency, keepalive_timeout=30)
+        # Add default timeout of 60 seconds
+        timeout = aiohttp.ClientTimeout(total=60)
+        return aiohttp.ClientSession(timeout=timeout, headers=self.headers, connector=connector)
+
+    async def generate_images(self, prompts, concurrency: int = None, indices: list[int] = None):
+        """
+        Generates one image per prompt, fanning the requests out over a single pooled session.
+        `prompts` may be a list or an async iterable (e.g. prompts of a streamed script); scene
+        indices follow their position unless `indices` gives them explicitly (e.g. to redo only
+        some scenes). Yields (index, image_path) tuples as soon as each scene completes (not in order).
+        Scenes whose download failed yield a black placeholder and are listed in `self.placeholders`.
+        """
+        limit = concurrency or self.concurrency
+        semaphore = asyncio.Semaphore(limit)
+        results = asyncio.Queue()
+        tasks = []
+
+        async with self._create_session(limit) as session:
+            async def worker(index, prompt):
+                try:
+                    async with semaphore:
+                        path = await self.generate_image(prompt, index, session=session)
+                    results.put_nowait((index, path, None))
+                except Exception as e:
+                    results.put_nowait((index, None, e))
+
+            async def feed():
+                # Launches a worker per prompt as soon as the prompt is known
+                try:
+                    if hasattr(prompts, "__aiter__"):
+                        position = 0
+                        async for prompt in prompts:
+                            index = indices[position] if indices else position
+                            tasks.append(asyncio.create_task(worker(index, prompt)))
+                            position += 1
+                    else:
+                        for position, prompt in enumerate(prompts):
+                            index = indices[position] if indices else position
+                            tasks.append(asyncio.create_task(worker(index, prompt)))
+                    results.put_nowait((None, len(tasks), None))
+                except Exception as e:
+                    results.put_nowait((None, None, e))
+
+            feeder = asyncio.create_task(feed())
+            total = None
+            yielded = 0
+            try:
+                while total is None or yielded < total:
+                    index, value, error = await results.get()
+                    if error:
+                        raise error
+                    if index is None:
+                        total = value
+                        continue
+                    yielded += 1
+                    yield index, value
+            finally:
+                # Consumer stopped early (or failed): don't leave requests running on a closed session
+                for task in [feeder] + tasks:
+                    task.cancel()
+                await asyncio.gather(feeder, *tasks, return_exceptions=True)
+
+    def _cache_key(self, prompt: str, index: int, model: str) -> str:
+        return DiskCache.make_key(prompt, self.width, self.height, index, model)
 
-    async def generate_image(self, prompt: str, index: int) -> str:
+    def cache_stats(self) -> dict:
+        """
+        Returns hit/miss counters of the image cache (empty when disabled).
+        """
+        return self.cache.stats() if self.cache else {}
+
+    async def generate_image(self, prompt: str, index: int, session: aiohttp.ClientSession = None) -> str:
         """
         Generates an image from a prompt using Pollinations AI.
+        Pass a pooled `session` to reuse its connections, otherwise one is opened for this call.
         Returns the absolute path to the image file.
         """
+        cached = self._from_cache(prompt, index)
+        if cached:
+            self.placeholders.discard(index)
+            return cached
+
+        if session is None:
+            async with self._create_session(limit=1) as session:
+                return await self._fetch_image(prompt, index, session)
+        return await self._fetch_image(prompt, index, session)
+
+    def _from_cache(self, prompt: str, index: int) -> str:
+        """
+        Copies a cached image for this prompt into the scene file. Returns its path or None on a miss.
+        """
+        if not self.cache:
+            return None
+
+        # Any model we would have fallen back to is an acceptable hit, in order of preference
+        keys = [self._cache_key(prompt, index, model) for model in self.models]
+        cached_path = self.cache.get(*keys)
+        if not cached_path:
+            return None
+
+        output_file = self.output_dir / f"scene_{index}.jpg"
+        shutil.copyfile(cached_path, output_file)
+        logger.info(f"Image cache hit for scene {index}: {output_file}")
+        return str(output_file)
+
+    async def _fetch_image(self, prompt: str, index: int, session: aiohttp.ClientSession) -> str:
         output_file = self.output_dir / f"scene_{index}.jpg"
         
         # Pollinations AI URL format
@@ -35,15 +158,11 @@ class ImageGenerator:
         
         logger.info(f"Generating image for scene {index}...")
         
-        # Models to try in order of preference
-        models = ["flux", "turbo", None] # None means default model
+        models = self.models
         
         retry_count = 5 # Increased from 3
         current_model_idx = 0
         
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-        }
         for attempt in range(retry_count):
             try:
                 # Select model for this attempt
@@ -55,40 +174,42 @@ class ImageGenerator:
                     if model:
                         current_url += f"&model={model}"
 
-                    # Add default timeout of 60 seconds and open a session per host
-                    timeout = aiohttp.ClientTimeout(total=60)
-                    async with aiohttp.ClientSession(timeout=timeout, headers=headers) as session:
-                        async with session.get(current_url) as response:
-                            # Accept only image responses; some endpoints return an HTML page saying the service moved or rate-limited
-                            content_type = response.headers.get("Content-Type", "")
-                            if response.status == 200 and content_type.startswith("image/"):
-                                image_data = await response.read()
-                                with open(output_file, "wb") as f:
-                                    f.write(image_data)
-                                logger.info(f"Image saved: {output_file} (Host: {host}, Model: {model})")
+                    # Reuse the pooled session (keep-alive connections) for every host and attempt
+                    async with session.get(current_url) as response:
+                        # Accept only image responses; some endpoints return an HTML page saying the service moved or rate-limited
+                        content_type = response.headers.get("Content-Type", "")
+                        if response.status == 200 and content_type.startswith("image/"):
+                            image_data = await response.read()
+                            with open(output_file, "wb") as f:
+                                f.write(image_data)
+                            logger.info(f"Image saved: {output_file} (Host: {host}, Model: {model})")
+                            self.placeholders.discard(index)
+                            if self.cache:
+                                self.cache.put_bytes(self._cache_key(prompt, index, model), image_data)
+                            return str(output_file)
+                        else:
+                            # Log details for debugging (status or non-image content)
+                            text_preview = ""
+                            try:
+                                text_preview = (await response.text())[:200]
+                            except Exception:
+                                pass
+                            logger.warning(f"Attempt {attempt+1}/{retry_count} failed for {current_url}. Status: {response.status}, Content-Type: {content_type}. Preview: {text_preview}")
+
+                            # Create an immediate black placeholder so caller has feedback
+                            try:
+                                from PIL import Image
+                                img = Image.new('RGB', (self.width, self.height), color='black')
+                                img.save(output_file)
+                                self.placeholders.add(index)
+                                logger.info(f"Wrote fallback black image due to non-image response: {output_file}")
                                 return str(output_file)
-                            else:
-                                # Log details for debugging (status or non-image content)
-                                text_preview = ""
-                                try:
-                                    text_preview = (await response.text())[:200]
-                                except Exception:
-                                    pass
-                                logger.warning(f"Attempt {attempt+1}/{retry_count} failed for {current_url}. Status: {response.status}, Content-Type: {content_type}. Preview: {text_preview}")
-
-                                # Create an immediate black placeholder so caller has feedback
-                                try:
-                                    from PIL import Image
-                                    img = Image.new('RGB', (self.width, self.height), color='black')
-                                    img.save(output_file)
-                                    logger.info(f"Wrote fallback black image due to non-image response: {output_file}")
-                                    return str(output_file)
-                                except Exception as e_img:
-                                    logger.error(f"Failed to write fallback image: {e_img}")
-
-                                # If server error, bump model index to try alternative models faster
-                                if response.status in [500, 502, 503, 504]:
-                                    current_model_idx += 1
+                            except Exception as e_img:
+                                logger.error(f"Failed to write fallback image: {e_img}")
+
+                            # If server error, bump model index to try alternative models faster
+                            if response.status in [500, 502, 503, 504]:
+                                current_model_idx += 1
 
                     # try next host if this one didn't return an image
 
@@ -110,6 +231,7 @@ class ImageGenerator:
                 from PIL import Image
                 img = Image.new('RGB', (self.width, self.height), color='black')
                 img.save(output_file)
+                self.placeholders.add(index)
         except Exception as e:
             logger.error(f"Error while creating fallback image: {e}")
 
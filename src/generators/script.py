@@ -1,12 +1,63 @@
 import json
 import asyncio
+import os
+import re
+import threading
+import time
 import g4f
+from ..utils.cache import DiskCache
 from ..utils.logger import logger
 from ..utils.config import Config
+from ..utils.context import JobContext
 
-class ScriptGenerator:
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])[\s\n]+')
+
+class SentenceSplitter:
+    """
+    Incremental version of ScriptGenerator._split_into_sentences for streamed text.
+    feed() returns the sentences completed by a chunk; flush() returns the remainder.
+    """
     def __init__(self):
+        self.buffer = ""
+
+    def feed(self, chunk: str) -> list[str]:
+        self.buffer += chunk
+        # A sentence is only complete once whitespace follows its punctuation
+        last_boundary = None
+        for last_boundary in SENTENCE_BOUNDARY.finditer(self.buffer):
+            pass
+        if last_boundary is None:
+            return []
+
+        complete = self.buffer[:last_boundary.start()]
+        self.buffer = self.buffer[last_boundary.end():]
+        return [s.strip() for s in SENTENCE_BOUNDARY.split(complete) if s.strip()]
+
+    def flush(self) -> list[str]:
+        remainder, self.buffer = self.buffer.strip(), ""
+        return [remainder] if remainder else []
+
+class ScriptGenerator:
+    # Per-model latency/success statistics, shared by all instances and persisted between runs
+    _model_stats = None
+    # Guards _model_stats and its file: Streamlit sessions run generators in parallel threads
+    _stats_lock = threading.RLock()
+
+    def __init__(self, use_cache: bool = None, context: JobContext = None):
+        self.context = context or JobContext.default()
         self.provider = Config.SCRIPT_PROVIDER
+        self.models = [
+            "gpt-4",
+            "gpt-3.5-turbo",
+            "command-r+"
+        ]
+
+        # Opt-in response cache so re-runs of the same topic skip the LLM round trips
+        if use_cache is None:
+            use_cache = self.context.llm_cache_enabled
+        self.cache = None
+        if use_cache:
+            self.cache = DiskCache("llm", max_entries=Config.LLM_CACHE_MAX_ENTRIES, suffix=".json")
 
     async def generate_viral_topic(self) -> str:
         """
@@ -23,14 +74,17 @@ class ScriptGenerator:
         
         Return ONLY the topic text. No quotes.
         """
-        topic = await self._call_llm(prompt)
+        # Never memoized: the point is a fresh idea every time
+        topic = await self._call_llm(prompt, use_cache=False)
         return topic if topic else "The room that shouldn't exist"
 
-    async def generate_script(self, topic: str = None) -> list[dict]:
+    async def generate_script(self, topic: str = None, refresh_prompts: bool = False) -> list[dict]:
         """
         Generates a horror script using a 2-step process:
         1. Write the Story (Text Only)
         2. Generate Image Prompts for each sentence
+        With the LLM cache enabled, `refresh_prompts=True` reuses a cached story but
+        asks for new image prompts.
         """
         if not topic:
             topic = "A random terrifying horror concept about the unknown"
@@ -52,12 +106,163 @@ class ScriptGenerator:
         
         # Step 3: Generate Prompts for sentences
         logger.info("Step 2: Generating visual prompts...")
-        scenes = await self._generate_prompts_for_sentences(sentences)
+        scenes = await self._generate_prompts_for_sentences(sentences, refresh=refresh_prompts)
         
         return scenes
 
-    async def _generate_story_text(self, topic: str) -> str:
-        prompt = f"""
+    async def generate_script_stream(self, topic: str = None, max_parallel_prompts: int = 2,
+                                     prompt_batch_size: int = 4, refresh_prompts: bool = False):
+        """
+        Streaming variant of generate_script().
+        The story is streamed from the LLM and split into sentences as it arrives; every
+        `prompt_batch_size` sentences get one batched image prompt request right away (the
+        rest when the story ends), so a story costs a few prompt calls instead of one per
+        sentence. Yields scene dicts {"text", "image_prompt"} in story order as soon as each
+        one is ready, so assets for scene 1 can start while the model is still writing the rest.
+        As in generate_script(), `refresh_prompts=True` reuses a cached story but asks for new
+        image prompts.
+        """
+        if not topic:
+            topic = "A random terrifying horror concept about the unknown"
+
+        logger.info(f"Streaming story for topic: {topic}...")
+        splitter = SentenceSplitter()
+        semaphore = asyncio.Semaphore(max_parallel_prompts)
+        story_so_far = []
+        pending = []
+        prompt_tasks = []
+        scenes = []
+        next_to_yield = 0
+
+        async def prompts_for(sentences, context):
+            async with semaphore:
+                batch = await self._generate_prompts_for_sentences(sentences, refresh=refresh_prompts, context=context)
+            if not isinstance(batch, list):
+                batch = []
+            # The model may merge or drop lines: match by position, generic prompt for the rest
+            prompts = []
+            for i, sentence in enumerate(sentences):
+                scene = batch[i] if i < len(batch) and isinstance(batch[i], dict) else {}
+                prompts.append(scene.get("image_prompt") or self._fallback_prompt(sentence))
+            return prompts
+
+        def schedule(sentences, final=False):
+            pending.extend(sentences)
+            while len(pending) >= prompt_batch_size or (final and pending):
+                batch = pending[:prompt_batch_size]
+                del pending[:prompt_batch_size]
+                context = " ".join(story_so_far)
+                story_so_far.extend(batch)
+                prompt_tasks.append((batch, asyncio.create_task(prompts_for(batch, context))))
+
+        def collect(batch, prompts):
+            scenes.extend({"text": sentence, "image_prompt": prompt} for sentence, prompt in zip(batch, prompts))
+
+        try:
+            async for chunk in self._stream_llm(self._story_prompt(topic)):
+                schedule(splitter.feed(chunk))
+                # Hand over every scene whose batch is already done, in order
+                while prompt_tasks and prompt_tasks[0][1].done():
+                    batch, task = prompt_tasks.pop(0)
+                    collect(batch, task.result())
+                while next_to_yield < len(scenes):
+                    next_to_yield += 1
+                    yield scenes[next_to_yield - 1]
+            schedule(splitter.flush(), final=True)
+
+            if not prompt_tasks and not scenes:
+                logger.error("Failed to stream story text. Using fallback.")
+                yield {
+                    "text": "I hear them scratching behind the walls at night (Fallback).",
+                    "image_prompt": "Hyper-realistic horror cinematic shot, 8k, dark moody lighting, shot on 35mm film, close up of a dirty wall with scratch marks"
+                }
+                return
+
+            while prompt_tasks:
+                batch, task = prompt_tasks.pop(0)
+                collect(batch, await task)
+                while next_to_yield < len(scenes):
+                    next_to_yield += 1
+                    yield scenes[next_to_yield - 1]
+        finally:
+            for _, task in prompt_tasks:
+                task.cancel()
+
+    def _fallback_prompt(self, sentence: str) -> str:
+        # Same algorithmic fallback as the batch path
+        return f"Hyper-realistic horror cinematic shot, 8k, dark moody lighting, shot on 35mm film. {sentence}"
+
+    async def _stream_llm(self, prompt: str):
+        """
+        Async generator over text chunks of a streamed completion.
+        Falls back to the next model only if the current one fails before producing text;
+        serves (and fills) the response cache like _call_llm().
+        """
+        if self.cache:
+            cached = self._cache_lookup(prompt)
+            if cached:
+                yield cached
+                return
+
+        loop = asyncio.get_running_loop()
+        finished = object()
+
+        for model in self._ordered_models():
+            queue = asyncio.Queue()
+            stop = threading.Event()
+
+            def produce(model=model, queue=queue, stop=stop):
+                # Runs in a worker thread: g4f's stream is a blocking generator
+                try:
+                    for chunk in g4f.ChatCompletion.create(
+                        model=model,
+                        messages=[{"role": "user", "content": prompt}],
+                        stream=True,
+                    ):
+                        if stop.is_set():
+                            return
+                        loop.call_soon_threadsafe(queue.put_nowait, chunk)
+                    loop.call_soon_threadsafe(queue.put_nowait, finished)
+                except Exception as e:
+                    loop.call_soon_threadsafe(queue.put_nowait, e)
+
+            start = time.monotonic()
+            parts = []
+            loop.run_in_executor(None, produce)
+            try:
+                while True:
+                    item = await asyncio.wait_for(queue.get(), timeout=Config.LLM_TIMEOUT)
+                    if item is finished:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+                    # Newer g4f versions interleave non-text markers in the stream
+                    if isinstance(item, str) and item:
+                        parts.append(item)
+                        yield item
+            except Exception as e:
+                self._record(model, False, time.monotonic() - start)
+                if parts:
+                    # Text already went downstream; switching models now would duplicate it
+                    logger.warning(f"Model {model} stream broke off: {e}. Keeping partial story.")
+                    return
+                logger.warning(f"Model {model} failed: {e}")
+                continue
+            finally:
+                stop.set()
+
+            response = "".join(parts).strip()
+            self._record(model, bool(response), time.monotonic() - start)
+            if not response:
+                continue
+            if self.cache:
+                self._forget(prompt)
+                entry = {"model": model, "created": time.time(), "response": response}
+                self.cache.put_bytes(self._cache_key(model, prompt), json.dumps(entry).encode("utf-8"))
+            return
+
+    def _story_prompt(self, topic: str) -> str:
+        return f"""
         You are a professional horror writer.
         Task: Write a short, terrifying horror story about: "{topic}".
         
@@ -67,22 +272,27 @@ class ScriptGenerator:
         3. Story: The story should be feel like real not fake. the story include story telling ,question and engaging story.
         4. Format: Return ONLY the raw story text. Do not include titles, formatting, or JSON.
         """
-        return await self._call_llm(prompt)
+
+    async def _generate_story_text(self, topic: str) -> str:
+        return await self._call_llm(self._story_prompt(topic))
 
     def _split_into_sentences(self, text: str) -> list[str]:
-        import re
         # Split by . ! ? followed by whitespace or newline
-        sentences = re.split(r'(?<=[.!?])[\s\n]+', text.strip())
+        sentences = SENTENCE_BOUNDARY.split(text.strip())
         return [s.strip() for s in sentences if s.strip()]
 
-    async def _generate_prompts_for_sentences(self, sentences: list[str]) -> list[dict]:
+    async def _generate_prompts_for_sentences(self, sentences: list[str], refresh: bool = False,
+                                              context: str = None) -> list[dict]:
         import json
         
         # Prepare a prompt that asks for visual descriptions for the provided text
         sentences_block = "\n".join([f"{i+1}. {s}" for i, s in enumerate(sentences)])
+        # Streamed batches continue a story: earlier sentences keep the visuals consistent
+        story_block = f"Story so far: {context}\n" if context else ""
         
         prompt = f"""
         You are a Horror Movie Director.
+        {story_block}
         Here is a script broken into sentences:
         
         {sentences_block}
@@ -98,7 +308,7 @@ class ScriptGenerator:
         Ensure the "text" field matches the input sentences exactly.
         """
         
-        response = await self._call_llm(prompt)
+        response = await self._call_llm(prompt, refresh=refresh)
         
         if response:
             try:
@@ -113,33 +323,235 @@ class ScriptGenerator:
                 return data
             except Exception as e:
                 logger.warning(f"Failed to parse scenes JSON: {e}")
+                # Don't let a cached bad answer poison the next attempt
+                self._forget(prompt)
 
         # Fallback: Just return text with generic prompts
         logger.warning("Using algorithmic fallback for prompts.")
-        return [{"text": s, "image_prompt": f"Hyper-realistic horror cinematic shot, 8k, dark moody lighting, shot on 35mm film. {s}"} for s in sentences]
+        return [{"text": s, "image_prompt": self._fallback_prompt(s)} for s in sentences]
 
-    async def _call_llm(self, prompt: str) -> str:
-        models_to_try = [
-            "gpt-4",
-            "gpt-3.5-turbo",
-            "command-r+"
-        ]
-        
-        for model in models_to_try:
+    def _normalize_prompt(self, prompt: str) -> str:
+        # Prompts are indented triple-quoted strings; whitespace differences shouldn't miss the cache
+        return re.sub(r"\s+", " ", prompt).strip()
+
+    def _cache_key(self, model: str, prompt: str) -> str:
+        return DiskCache.make_key(model, self._normalize_prompt(prompt))
+
+    def _cache_lookup(self, prompt: str) -> str:
+        """
+        Returns a cached, non-expired response from any of the models, in preference order.
+        """
+        keys = [self._cache_key(model, prompt) for model in self.models]
+        entries = {}
+
+        def fresh(key, path):
+            # Expired or unreadable entries are misses (and don't count as cache hits)
             try:
-                # logger.info(f"Calling {model}...")
-                response = await asyncio.wait_for(
-                    asyncio.to_thread(
-                        g4f.ChatCompletion.create,
-                        model=model,
-                        messages=[{"role": "user", "content": prompt}],
-                    ),
-                    timeout=40.0
-                )
-                if response:
-                    return response.strip()
+                with open(path, "r", encoding="utf-8") as f:
+                    entry = json.load(f)
             except Exception as e:
-                logger.warning(f"Model {model} failed: {e}")
-                continue
-        
-        return None
+                logger.warning(f"Unreadable LLM cache entry {path.name}: {e}")
+                return False
+            if time.time() - entry.get("created", 0) > Config.LLM_CACHE_TTL:
+                return False
+            entries[key] = entry
+            return True
+
+        path = self.cache.get(*keys, valid=fresh)
+        if not path:
+            return None
+
+        # Lookup stops at the first fresh entry, so exactly one was parsed
+        entry = next(iter(entries.values()))
+        logger.info(f"LLM cache hit ({entry.get('model')})")
+        return entry.get("response")
+
+    def _forget(self, prompt: str):
+        if self.cache:
+            for model in self.models:
+                self.cache.delete(self._cache_key(model, prompt))
+
+    @classmethod
+    def _stats_path(cls):
+        return Config.CACHE_DIR / "llm_model_stats.json"
+
+    @classmethod
+    def _load_stats(cls) -> dict:
+        with cls._stats_lock:
+            if cls._model_stats is None:
+                cls._model_stats = {}
+                try:
+                    with open(cls._stats_path(), "r", encoding="utf-8") as f:
+                        cls._model_stats = json.load(f)
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    logger.warning(f"Ignoring unreadable model stats: {e}")
+            return cls._model_stats
+
+    @classmethod
+    def _stats_snapshot(cls) -> dict:
+        # Copy taken under the lock, so readers never iterate a dict another thread is updating
+        with cls._stats_lock:
+            return {model: dict(stats) for model, stats in cls._load_stats().items()}
+
+    def _record(self, model: str, success: bool, latency: float):
+        with self._stats_lock:
+            stats = self._load_stats().setdefault(model, {"calls": 0, "successes": 0, "total_latency": 0.0})
+            stats["calls"] += 1
+            if success:
+                stats["successes"] += 1
+                stats["total_latency"] += latency
+            try:
+                # Write-then-rename: other processes may be saving the same file concurrently
+                path = self._stats_path()
+                tmp_path = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump(self._model_stats, f, indent=4)
+                os.replace(tmp_path, path)
+            except Exception as e:
+                logger.warning(f"Failed to save model stats: {e}")
+
+    def model_stats(self) -> dict:
+        """
+        Returns {model: {calls, successes, success_rate, mean_latency}} for every model seen so far.
+        """
+        report = {}
+        for model, stats in self._stats_snapshot().items():
+            report[model] = {
+                "calls": stats["calls"],
+                "successes": stats["successes"],
+                "success_rate": stats["successes"] / stats["calls"] if stats["calls"] else 0.0,
+                "mean_latency": stats["total_latency"] / stats["successes"] if stats["successes"] else None,
+            }
+        return report
+
+    def _ordered_models(self) -> list[str]:
+        """
+        Orders self.models by observed success rate, then mean latency.
+        Models without history keep their configured position among equals.
+        """
+        stats = self._stats_snapshot()
+
+        def score(item):
+            position, model = item
+            s = stats.get(model)
+            if not s or not s["calls"]:
+                return (-0.5, Config.LLM_TIMEOUT, position)
+            # Laplace-smoothed success rate so one lucky/unlucky call doesn't dominate
+            success_rate = (s["successes"] + 1) / (s["calls"] + 2)
+            mean_latency = s["total_latency"] / s["successes"] if s["successes"] else Config.LLM_TIMEOUT
+            return (-success_rate, mean_latency, position)
+
+        return [model for _, model in sorted(enumerate(self.models), key=score)]
+
+    async def _call_model(self, model: str, prompt: str) -> str:
+        """
+        Calls a single model and records its latency/success. Raises on failure or empty output.
+        """
+        start = time.monotonic()
+        try:
+            response = await asyncio.wait_for(
+                asyncio.to_thread(
+                    g4f.ChatCompletion.create,
+                    model=model,
+                    messages=[{"role": "user", "content": prompt}],
+                ),
+                timeout=Config.LLM_TIMEOUT
+            )
+        except asyncio.CancelledError:
+            # Lost a hedged race; says nothing about the model itself
+            raise
+        except Exception:
+            self._record(model, False, time.monotonic() - start)
+            raise
+
+        response = response.strip() if isinstance(response, str) else ""
+        self._record(model, bool(response), time.monotonic() - start)
+        if not response:
+            raise ValueError("empty response")
+        return response
+
+    async def _call_hedged(self, models: list[str], prompt: str, delay: float) -> tuple[str, str]:
+        """
+        Starts models[0], then launches the next model every `delay` seconds (or as soon as
+        one fails) until one answers. Returns (model, response) of the first success and
+        cancels the rest; (None, None) if every model failed.
+        """
+        remaining = list(models)
+        model_of = {}
+        pending = set()
+
+        def launch():
+            model = remaining.pop(0)
+            task = asyncio.create_task(self._call_model(model, prompt))
+            model_of[task] = model
+            pending.add(task)
+
+        launch()
+        if delay <= 0:
+            while remaining:
+                launch()
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending,
+                    timeout=delay if remaining else None,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if not done:
+                    # Hedge: nobody answered within the delay, start the next model too
+                    launch()
+                    continue
+
+                for task in done:
+                    if task.exception() is None:
+                        return model_of[task], task.result()
+                    logger.warning(f"Model {model_of[task]} failed: {task.exception()}")
+
+                if remaining:
+                    launch()
+            return None, None
+        finally:
+            # Note: to_thread workers can't be interrupted; their late results are simply dropped
+            for task in pending:
+                task.cancel()
+
+    async def _call_llm(self, prompt: str, use_cache: bool = True, refresh: bool = False) -> str:
+        """
+        Calls the LLM, falling back through self.models (best observed model first).
+        With Config.LLM_HEDGE_DELAY set, slower models are raced instead of awaited in turn.
+        `refresh=True` skips the cache lookup but still stores the new response.
+        """
+        use_cache = use_cache and self.cache is not None
+        if use_cache and not refresh:
+            cached = self._cache_lookup(prompt)
+            if cached:
+                return cached
+
+        models = self._ordered_models()
+        model, response = None, None
+
+        if Config.LLM_HEDGE_DELAY is not None:
+            model, response = await self._call_hedged(models, prompt, Config.LLM_HEDGE_DELAY)
+        else:
+            for candidate in models:
+                try:
+                    # logger.info(f"Calling {candidate}...")
+                    response = await self._call_model(candidate, prompt)
+                    model = candidate
+                    break
+                except Exception as e:
+                    logger.warning(f"Model {candidate} failed: {e}")
+                    continue
+
+        if not response:
+            return None
+
+        if use_cache:
+            # Replace whatever another model answered earlier for this prompt
+            self._forget(prompt)
+            entry = {"model": model, "created": time.time(), "response": response}
+            self.cache.put_bytes(self._cache_key(model, prompt), json.dumps(entry).encode("utf-8"))
+        return response
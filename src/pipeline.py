@@ -0,0 +1,287 @@
+import asyncio
+import json
+import time
+from pathlib import Path
+from .generators.script import ScriptGenerator
+from .generators.audio import AudioGenerator
+from .generators.image import ImageGenerator
+from .video.composer import VideoCompositor
+from .utils.alignment import align_scenes
+from .utils.config import Config
+from .utils.context import JobContext
+from .utils.logger import logger
+from .utils.manifest import JobManifest
+
+def apply_alignment(scenes: list, boundaries: list[dict], total_duration: float = None):
+    """
+    Sets each scene's 'start', 'duration' and spoken 'words' from the narration's WordBoundary events.
+    """
+    spans = align_scenes([scene['text'] for scene in scenes], boundaries, total_duration=total_duration)
+    for scene, span in zip(scenes, spans):
+        scene['start'] = span['start']
+        scene['duration'] = span['end'] - span['start']
+        scene['words'] = span['words']
+
+class ScenePipe:
+    """
+    Hand-off from asset generation to a pipelined renderer. `timeline` resolves with
+    (timed_scenes, audio_path) once the narration is aligned; then (index, image_path) items
+    follow on the bounded `queue` in scene order as the images arrive, ended by None.
+    """
+    def __init__(self, maxsize: int = None):
+        self.timeline = asyncio.get_running_loop().create_future()
+        self.queue = asyncio.Queue(maxsize or Config.RENDER_QUEUE_SCENES)
+        self._next = 0
+        self._lock = asyncio.Lock()
+
+    async def publish(self, image_paths: dict):
+        """
+        Pushes every scene whose image (and every earlier scene's image) is ready.
+        Blocks while the queue is full, i.e. while the renderer is busy.
+        """
+        async with self._lock:
+            while self.timeline.done() and self._next in image_paths:
+                await self.queue.put((self._next, image_paths[self._next]))
+                self._next += 1
+
+    async def close(self):
+        await self.queue.put(None)
+
+def job_context(job: JobManifest, **settings) -> JobContext:
+    """
+    Context whose workspace is the job's checkpoint directory, so scene files persist for --resume.
+    """
+    return JobContext.create(job.job_id, workspace=job.job_dir, **settings)
+
+async def generate_assets(job: JobManifest, script_path: Path = None, report=None, context: JobContext = None,
+                          pipe: ScenePipe = None, refresh_prompts: bool = False) -> dict:
+    """
+    Network stage of a job: script (streamed), scene images (concurrent, started as soon as
+    each scene is written) and the continuous narration with per-scene timings.
+    Every artifact is checkpointed in the job's manifest; stages (or single images) that are
+    already complete and valid are reused instead of regenerated.
+    With a `pipe`, timed scenes are handed to a pipelined renderer as soon as they are ready.
+    `refresh_prompts` asks for new image prompts even when the story comes from the LLM cache
+    (only when a new script is written; a resumed script keeps its prompts).
+    Returns {"job_id", "topic", "script", "scenes", "audio_path", "timings"} ready for render_video().
+    """
+    report = report or logger.info
+    context = context or job_context(job)
+    timings = {}
+    started = time.perf_counter()
+
+    script_gen = ScriptGenerator(context=context)
+    image_gen = ImageGenerator(context=context)
+    audio_gen = AudioGenerator(context=context)
+
+    image_paths = {}
+
+    async def collect_images(prompts, indices=None):
+        # Images arrive out of order; keyed by scene index and checkpointed one by one
+        async for i, image_path in image_gen.generate_images(prompts, indices=indices):
+            image_paths[i] = image_path
+            if i in image_gen.placeholders:
+                # Rendered as is for now, but left unrecorded so --resume downloads it again
+                report(f"Image {i} is a placeholder, it will be retried on resume.")
+            else:
+                job.record("images", i, image_path)
+            if pipe:
+                await pipe.publish(image_paths)
+
+    # 1. Script
+    if job.is_complete("script"):
+        with open(job.artifact("script", "script"), "r", encoding="utf-8") as f:
+            scenes = json.load(f)
+        report(f"Resumed script with {len(scenes)} scenes.")
+
+        for i in range(len(scenes)):
+            existing = job.artifact("images", i)
+            if existing:
+                image_paths[i] = str(existing)
+        missing = [i for i in range(len(scenes)) if i not in image_paths]
+        if missing:
+            report(f"Regenerating {len(missing)} missing image(s)...")
+            # A video rendered from the previous images is stale
+            job.reset("video")
+        images_task = asyncio.create_task(
+            collect_images([scenes[i]['image_prompt'] for i in missing], indices=missing)
+        )
+    else:
+        # A new script invalidates everything derived from a previous attempt
+        for stage in ("script", "images", "narration", "video"):
+            job.reset(stage)
+
+        # Streamed: scene images start downloading while the story is still being written
+        scenes = []
+        script_done = asyncio.Event()
+        # Set only when the story stream ran to its end (script_done is also set on failure)
+        script_ok = False
+
+        async def image_prompts():
+            nonlocal script_ok
+            try:
+                async for scene in script_gen.generate_script_stream(job.topic, refresh_prompts=refresh_prompts):
+                    scenes.append(scene)
+                    yield scene['image_prompt']
+                script_ok = True
+            finally:
+                script_done.set()
+
+        images_task = asyncio.create_task(collect_images(image_prompts()))
+
+    try:
+        if not job.is_complete("script"):
+            await script_done.wait()
+            if not script_ok:
+                # The stream failed or was cancelled: raise its error before anything checkpoints
+                # (or narrates) the truncated story. The images task re-raises it.
+                await images_task
+                raise RuntimeError("Script stream ended before the story was complete")
+            report(f"Created {len(scenes)} scenes.")
+
+            script_file = job.path("script.json")
+            with open(script_file, "w", encoding="utf-8") as f:
+                json.dump(scenes, f, indent=4)
+            job.record("script", "script", script_file)
+            job.complete("script")
+        timings["script"] = time.perf_counter() - started
+
+        # Save script to file
+        if script_path:
+            with open(script_path, "w", encoding="utf-8") as f:
+                json.dump(scenes, f, indent=4)
+
+        # 2. Continuous Audio Generation
+        stage_start = time.perf_counter()
+        if job.is_complete("narration", keys=["audio", "words"]):
+            audio_path = str(job.artifact("narration", "audio"))
+            with open(job.artifact("narration", "words"), "r", encoding="utf-8") as f:
+                boundaries = json.load(f)
+            report("Resumed narration.")
+        else:
+            report("Generating Narration...")
+            job.reset("narration")
+            job.reset("video")
+            full_script_text = " ".join([s['text'] for s in scenes])
+            audio_path, boundaries = await audio_gen.generate_narration(full_script_text, filename="story_narration")
+            words_file = job.path("story_narration.words.json")
+            with open(words_file, "w", encoding="utf-8") as f:
+                json.dump(boundaries, f)
+            job.record("narration", "audio", audio_path)
+            job.record("narration", "words", words_file)
+            job.complete("narration")
+
+        # Align the WordBoundary events to the scenes to get EXACT timings for each scene
+        report("Syncing Audio...")
+        apply_alignment(scenes, boundaries, total_duration=audio_gen.duration(audio_path))
+        timings["narration"] = time.perf_counter() - stage_start
+        if pipe:
+            pipe.timeline.set_result((
+                [{key: scene[key] for key in ("text", "start", "duration", "words")} for scene in scenes],
+                audio_path
+            ))
+            await pipe.publish(image_paths)
+
+        # 3. Wait for the Images (already running since the first scene was written)
+        report(f"Generating {len(scenes)} Cinematic Images...")
+        stage_start = time.perf_counter()
+        await images_task
+        timings["images_wait"] = time.perf_counter() - stage_start
+        report(f"Received {len(image_paths)}/{len(scenes)} images.")
+        if len(image_paths) == len(scenes) and not image_gen.placeholders:
+            job.complete("images")
+        if pipe:
+            await pipe.publish(image_paths)
+            await pipe.close()
+    finally:
+        if not images_task.done():
+            images_task.cancel()
+
+    processed_scenes = []
+    for i, scene in enumerate(scenes):
+        processed_scenes.append({
+            "text": scene['text'],
+            "image": image_paths[i],
+            "start": scene['start'],
+            "duration": scene['duration'],
+            "words": scene['words']
+        })
+
+    timings["assets_total"] = time.perf_counter() - started
+    return {
+        "job_id": job.job_id,
+        "topic": job.topic,
+        "script": scenes,
+        "scenes": processed_scenes,
+        "audio_path": audio_path,
+        "timings": timings,
+    }
+
+def render_video(assets: dict, output_filename: str = "final_video.mp4", context: JobContext = None) -> str:
+    """
+    CPU stage of a job: composes and encodes the video from generate_assets() output.
+    Skipped when the job already has a valid rendered video. (With the segments backend,
+    unchanged scenes are also reused from the segment cache.)
+    """
+    job = JobManifest.load(assets["job_id"])
+    existing = job.artifact("video", "video")
+    if job.is_complete("video") and existing:
+        logger.info(f"Job {job.job_id}: video already rendered, skipping: {existing}")
+        return str(existing)
+
+    compositor = VideoCompositor(context=context or job_context(job))
+    output_path = compositor.assemble_video(
+        assets["scenes"],
+        output_filename=output_filename,
+        master_audio_path=assets["audio_path"]
+    )
+    job.record("video", "video", output_path)
+    job.complete("video")
+    return output_path
+
+async def generate_and_render(job: JobManifest, output_filename: str = "final_video.mp4", script_path: Path = None,
+                              report=None, context: JobContext = None, refresh_prompts: bool = False) -> tuple[dict, str]:
+    """
+    Runs asset generation and rendering as producer and consumer: every scene is encoded
+    (as a segment, in order) as soon as its image and timing exist, so encoding hides behind
+    the image downloads instead of starting after the last one. Returns (assets, video_path).
+    `refresh_prompts` is passed on to generate_assets().
+    """
+    context = context or job_context(job)
+    if job.is_complete("video") and job.artifact("video", "video"):
+        # generate_assets() resets the video stage if it has to redo any image or the narration
+        assets = await generate_assets(job, script_path, report, context, refresh_prompts=refresh_prompts)
+        existing = job.artifact("video", "video")
+        if job.is_complete("video") and existing:
+            logger.info(f"Job {job.job_id}: video already rendered, skipping: {existing}")
+            return assets, str(existing)
+        # Every asset is ready by now, there is nothing left to overlap the encoding with
+        loop = asyncio.get_running_loop()
+        return assets, await loop.run_in_executor(None, render_video, assets, output_filename, context)
+
+    pipe = ScenePipe()
+    compositor = VideoCompositor(context=context)
+
+    async def render():
+        timed_scenes, audio_path = await pipe.timeline
+        return await compositor.assemble_streamed(
+            timed_scenes, pipe.queue, output_filename=output_filename, master_audio_path=audio_path
+        )
+
+    producer = asyncio.create_task(generate_assets(job, script_path, report, context, pipe=pipe, refresh_prompts=refresh_prompts))
+    consumer = asyncio.create_task(render())
+    try:
+        # Either side failing stops the other (a stalled consumer would block the producer forever)
+        done, _ = await asyncio.wait({producer, consumer}, return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            task.result()
+        assets = await producer
+        output_path = await consumer
+    finally:
+        for task in (producer, consumer):
+            if not task.done():
+                task.cancel()
+
+    job.record("video", "video", output_path)
+    job.complete("video")
+    return assets, output_path
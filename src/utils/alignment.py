@@ -0,0 +1,99 @@
+# edge-tts reports WordBoundary offsets/durations in 100-nanosecond ticks
+TICKS_PER_SECOND = 10_000_000
+# How far ahead (in normalized characters) a spoken word may be found after the previous one.
+# Bounds every lookup, so the whole alignment stays linear in the script length.
+MAX_SKIP_CHARS = 200
+
+def normalize(text: str) -> str:
+    return "".join(c for c in text.casefold() if c.isalnum())
+
+def words_from_boundaries(boundaries: list[dict]) -> list[dict]:
+    """
+    Converts WordBoundary events into [{"text", "start", "end"}] with times in seconds.
+    """
+    words = []
+    for boundary in boundaries:
+        start = boundary["offset"] / TICKS_PER_SECOND
+        words.append({
+            "text": boundary["text"],
+            "start": start,
+            "end": start + boundary["duration"] / TICKS_PER_SECOND,
+        })
+    return words
+
+def locate_words(scene_texts: list[str], words: list[dict]) -> list[int]:
+    """
+    Returns the scene index of every spoken word, in one forward pass.
+    The scenes are matched as one normalized character stream; each word is looked up right
+    after the previous match (within MAX_SKIP_CHARS). Words that can't be found (e.g. numbers
+    spoken differently than written) stay in the current scene without moving the cursor.
+    """
+    script = []
+    scene_starts = []
+    length = 0
+    for text in scene_texts:
+        scene_starts.append(length)
+        normalized = normalize(text)
+        script.append(normalized)
+        length += len(normalized)
+    script = "".join(script)
+
+    cursor = 0
+    scene = 0
+    indices = []
+    for word in words:
+        token = normalize(word["text"])
+        if token:
+            if script.startswith(token, cursor):
+                position = cursor
+            else:
+                position = script.find(token, cursor, cursor + len(token) + MAX_SKIP_CHARS)
+            if position >= 0:
+                # The word belongs to the scene its first character falls in
+                while scene + 1 < len(scene_starts) and scene_starts[scene + 1] <= position:
+                    scene += 1
+                cursor = position + len(token)
+        indices.append(scene)
+    return indices
+
+def align_scenes(scene_texts: list[str], boundaries: list[dict], total_duration: float = None) -> list[dict]:
+    """
+    Aligns narration WordBoundary events to the scene texts.
+    Returns one {"start", "end", "words"} per scene (seconds, words with absolute times).
+    Spans are contiguous and cover the whole narration: the first scene starts at 0, each
+    scene ends where the next one's first word starts, and the last one ends at
+    `total_duration` (or the last word). Scenes without any matched word get a share of
+    their neighbours' gap proportional to their text length.
+    """
+    words = words_from_boundaries(boundaries)
+    scenes = [{"start": None, "end": None, "words": []} for _ in scene_texts]
+    if not scenes:
+        return scenes
+
+    for word, index in zip(words, locate_words(scene_texts, words)):
+        scenes[index]["words"].append(word)
+
+    end = total_duration if total_duration is not None else (words[-1]["end"] if words else 0.0)
+    for scene in scenes:
+        if scene["words"]:
+            scene["start"] = scene["words"][0]["start"]
+    scenes[0]["start"] = 0.0
+
+    # Fill scenes without words by interpolating on text length between known starts
+    weights = [max(len(normalize(text)), 1) for text in scene_texts]
+    known = [i for i, scene in enumerate(scenes) if scene["start"] is not None] + [len(scenes)]
+    for left, right in zip(known, known[1:]):
+        if right - left == 1:
+            continue
+        right_time = scenes[right]["start"] if right < len(scenes) else end
+        total_weight = sum(weights[left:right])
+        time = scenes[left]["start"]
+        step = (right_time - time) / total_weight
+        for i in range(left + 1, right):
+            time += weights[i - 1] * step
+            scenes[i]["start"] = time
+
+    for scene, following in zip(scenes, scenes[1:]):
+        scene["end"] = following["start"]
+    scenes[-1]["end"] = max(end, scenes[-1]["start"])
+    return scenes
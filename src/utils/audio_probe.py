@@ -0,0 +1,214 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+from .cache import DiskCache
+from .logger import logger
+
+# Bitrates (kbps) by [MPEG-1?][layer][index]; index 0 is "free format", 15 is invalid
+_BITRATES = {
+    True: {
+        1: [0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448],
+        2: [0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384],
+        3: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    },
+    False: {
+        1: [0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256],
+        2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+        3: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+    },
+}
+# Sample rates by version bits (0: MPEG-2.5, 2: MPEG-2, 3: MPEG-1)
+_SAMPLE_RATES = {0: (11025, 12000, 8000), 2: (22050, 24000, 16000), 3: (44100, 48000, 32000)}
+# Bump when the probe's results change for identical files
+PROBE_VERSION = 1
+
+def _parse_header(data, pos: int) -> dict:
+    """
+    Parses the 4-byte MPEG audio frame header at `pos`; returns None if it isn't one.
+    """
+    if pos + 4 > len(data) or data[pos] != 0xFF or (data[pos + 1] & 0xE0) != 0xE0:
+        return None
+    b1, b2, b3 = data[pos + 1], data[pos + 2], data[pos + 3]
+    version_bits = (b1 >> 3) & 0x3
+    layer = 4 - ((b1 >> 1) & 0x3)
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 0x3
+    if version_bits == 1 or layer == 4 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+
+    mpeg1 = version_bits == 3
+    bitrate = _BITRATES[mpeg1][layer][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version_bits][rate_index]
+    padding = (b2 >> 1) & 0x1
+    channels = 1 if (b3 >> 6) == 3 else 2
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate // sample_rate + padding) * 4
+    else:
+        samples = 1152 if (layer == 2 or mpeg1) else 576
+        length = samples // 8 * bitrate // sample_rate + padding
+    return {
+        "mpeg1": mpeg1,
+        "layer": layer,
+        "bitrate": bitrate,
+        "sample_rate": sample_rate,
+        "channels": channels,
+        "samples": samples,
+        "length": length,
+    }
+
+def _skip_id3v2(data) -> int:
+    pos = 0
+    # Files can carry several ID3v2 tags back to back
+    while data[pos:pos + 3] == b"ID3" and pos + 10 <= len(data):
+        size = 0
+        for byte in data[pos + 6:pos + 10]:
+            size = (size << 7) | (byte & 0x7F)
+        has_footer = data[pos + 5] & 0x10
+        pos += 10 + size + (10 if has_footer else 0)
+    return pos
+
+def _read_vbr_tag(data, pos: int, header: dict) -> dict:
+    """
+    Reads the Xing/Info (with optional LAME gapless info) or VBRI tag in the first frame.
+    Returns {"frames", "delay", "padding"} or None if the frame is a regular audio frame.
+    """
+    if header["mpeg1"]:
+        side_info = 17 if header["channels"] == 1 else 32
+    else:
+        side_info = 9 if header["channels"] == 1 else 17
+    xing = pos + 4 + side_info
+
+    if data[xing:xing + 4] in (b"Xing", b"Info"):
+        flags = int.from_bytes(data[xing + 4:xing + 8], "big")
+        offset = xing + 8
+        frames = None
+        if flags & 0x1:
+            frames = int.from_bytes(data[offset:offset + 4], "big")
+            offset += 4
+        if flags & 0x2:
+            offset += 4 # byte count
+        if flags & 0x4:
+            offset += 100 # seek table
+        if flags & 0x8:
+            offset += 4 # quality
+        delay = padding = 0
+        # LAME extension: 9-byte encoder version, then delay/padding at +21 (12 bits each)
+        if data[offset:offset + 4] in (b"LAME", b"Lavf", b"Lavc") and offset + 24 <= len(data):
+            gapless = int.from_bytes(data[offset + 21:offset + 24], "big")
+            delay, padding = gapless >> 12, gapless & 0xFFF
+        return {"frames": frames, "delay": delay, "padding": padding}
+
+    vbri = pos + 4 + 32
+    if data[vbri:vbri + 4] == b"VBRI":
+        frames = int.from_bytes(data[vbri + 14:vbri + 18], "big")
+        delay = int.from_bytes(data[vbri + 6:vbri + 8], "big")
+        return {"frames": frames, "delay": delay, "padding": 0}
+    return None
+
+def probe_mp3_bytes(data: bytes) -> dict:
+    """
+    Reads MP3 metadata from the frame headers alone (no decoding).
+    Uses the Xing/Info or VBRI frame count when present, otherwise walks every frame header.
+    Returns {"duration_us", "sample_rate", "channels", "bitrate", "frames", "vbr_tag"}.
+    Raises ValueError if no MPEG audio frame is found.
+    """
+    data = memoryview(data)
+    pos = _skip_id3v2(data)
+
+    # Sync to the first frame whose successor is also a valid header (avoids false syncs)
+    first = None
+    while pos + 4 <= len(data):
+        header = _parse_header(data, pos)
+        if header:
+            following = pos + header["length"]
+            if following + 4 > len(data) or _parse_header(data, following):
+                first = header
+                break
+        pos += 1
+    if first is None:
+        raise ValueError("No MPEG audio frames found")
+
+    sample_rate = first["sample_rate"]
+    tag = _read_vbr_tag(data, pos, first)
+    if tag and tag["frames"]:
+        samples = tag["frames"] * first["samples"] - tag["delay"] - tag["padding"]
+        frames = tag["frames"]
+        total_bytes = len(data) - pos - first["length"]
+    else:
+        if tag:
+            pos += first["length"] # Info frame without a frame count; it holds no audio
+        frames = samples = total_bytes = 0
+        while pos + 4 <= len(data):
+            header = _parse_header(data, pos)
+            if header is None:
+                # ID3v1/APE trailers or garbage: resync byte by byte
+                if data[pos:pos + 3] == b"TAG":
+                    break
+                pos += 1
+                continue
+            frames += 1
+            samples += header["samples"]
+            total_bytes += header["length"]
+            pos += header["length"]
+
+    samples = max(samples, 0)
+    duration_us = samples * 1_000_000 // sample_rate
+    return {
+        "duration_us": duration_us,
+        "sample_rate": sample_rate,
+        "channels": first["channels"],
+        # Average bitrate, so VBR files report something meaningful too
+        "bitrate": int(total_bytes * 8 * 1_000_000 / duration_us) if duration_us else first["bitrate"],
+        "frames": frames,
+        "vbr_tag": bool(tag),
+    }
+
+_cache = None
+_cache_lock = threading.Lock()
+# (path, size, mtime_ns) -> metadata, so unchanged files aren't even re-hashed
+_memo = {}
+
+def _meta_cache() -> DiskCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = DiskCache("audio_meta", max_entries=5000, suffix=".json")
+        return _cache
+
+def probe_audio(path) -> dict:
+    """
+    Metadata of an MP3 file (see probe_mp3_bytes), cached per content hash across runs.
+    """
+    path = Path(path)
+    stat = path.stat()
+    memo_key = (str(path.resolve()), stat.st_size, stat.st_mtime_ns)
+    meta = _memo.get(memo_key)
+    if meta is not None:
+        return meta
+
+    data = path.read_bytes()
+    cache = _meta_cache()
+    key = DiskCache.make_key(PROBE_VERSION, hashlib.sha256(data).hexdigest())
+    cached = cache.get(key)
+    meta = None
+    if cached:
+        try:
+            with open(cached, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except Exception as e:
+            logger.warning(f"Unreadable audio metadata cache entry {cached.name}: {e}")
+    if meta is None:
+        meta = probe_mp3_bytes(data)
+        cache.put_bytes(key, json.dumps(meta).encode("utf-8"))
+
+    _memo[memo_key] = meta
+    return meta
+
+def audio_duration(path) -> float:
+    """
+    Exact duration of an MP3 file in seconds, without spawning a decoder.
+    """
+    return probe_audio(path)["duration_us"] / 1_000_000
@@ -0,0 +1,265 @@
+import hashlib
+import json
+import os
+import subprocess
+import threading
+from pathlib import Path
+import numpy as np
+from .audio_probe import probe_audio
+from .config import Config
+from .logger import logger
+
+# Bump when decoding/normalization/loop preparation changes the cached PCM
+BGM_INDEX_VERSION = 1
+# Block size for the loudness measurement and the gates (BS.1770-style, unweighted)
+LOUDNESS_BLOCK = 0.4
+ABSOLUTE_GATE_DB = -70.0
+RELATIVE_GATE_DB = -10.0
+SILENCE_DB = -60.0
+
+def _ffmpeg_binary() -> str:
+    # Same binary as the video writers (MoviePy's imageio-ffmpeg by default)
+    from ..video.ffmpeg_writer import get_ffmpeg_binary
+    return get_ffmpeg_binary()
+
+def decode_pcm(path, sample_rate: int) -> np.ndarray:
+    """
+    Decodes any audio file to float32 stereo PCM of shape (samples, 2) with ffmpeg.
+    """
+    command = [
+        _ffmpeg_binary(), "-v", "error", "-i", str(path),
+        "-f", "f32le", "-acodec", "pcm_f32le", "-ac", "2", "-ar", str(sample_rate), "-",
+    ]
+    result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise IOError(f"ffmpeg failed decoding {path}: {result.stderr.decode('utf-8', errors='replace').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.float32).reshape(-1, 2)
+
+def measure_loudness(pcm: np.ndarray, sample_rate: int) -> float:
+    """
+    Gated loudness (dB relative to full scale) of float PCM: mean energy of 400 ms blocks
+    above an absolute gate and a gate 10 dB below the ungated mean, so silence and quiet
+    intros don't drag the level down.
+    """
+    block = max(int(sample_rate * LOUDNESS_BLOCK), 1)
+    usable = len(pcm) - len(pcm) % block
+    if usable == 0:
+        return ABSOLUTE_GATE_DB
+    energy = np.square(pcm[:usable], dtype=np.float64).mean(axis=1).reshape(-1, block).mean(axis=1)
+    with np.errstate(divide="ignore"):
+        levels = 10 * np.log10(energy)
+    gated = energy[levels > ABSOLUTE_GATE_DB]
+    if not len(gated):
+        return ABSOLUTE_GATE_DB
+    relative_gate = 10 * np.log10(gated.mean()) + RELATIVE_GATE_DB
+    gated = gated[10 * np.log10(gated) > relative_gate]
+    return float(10 * np.log10(gated.mean()))
+
+def trim_silence(pcm: np.ndarray) -> np.ndarray:
+    """
+    Drops leading/trailing digital silence, which would otherwise be heard as a gap at every loop.
+    """
+    loud = np.flatnonzero(np.abs(pcm).max(axis=1) > 10 ** (SILENCE_DB / 20))
+    if not len(loud):
+        return pcm
+    return pcm[loud[0]:loud[-1] + 1]
+
+def make_seamless(pcm: np.ndarray, crossfade: int) -> tuple[np.ndarray, int]:
+    """
+    Folds the head of the track into its tail with an equal-power crossfade.
+    Returns (pcm, loop_start): playing pcm once and then pcm[loop_start:] over and over has
+    no click or gap, because the last `crossfade` samples already fade into the opening.
+    """
+    crossfade = min(crossfade, len(pcm) // 2)
+    if crossfade <= 0:
+        return pcm, 0
+    ramp = np.linspace(0.0, np.pi / 2, crossfade, dtype=np.float32)[:, None]
+    looped = pcm.copy()
+    looped[-crossfade:] = pcm[-crossfade:] * np.cos(ramp) + pcm[:crossfade] * np.sin(ramp)
+    return looped, crossfade
+
+class BGMLibrary:
+    """
+    Index of the background music tracks in a directory.
+    Each track is decoded once (per content hash), trimmed, loudness-normalized to
+    Config.BGM_TARGET_LOUDNESS, prepared for seamless looping and stored as int16 PCM
+    (.npy) that is memory-mapped at mix time, so picking and mixing a track never decodes it again.
+    """
+    def __init__(self, bgm_dir: Path = None, sample_rate: int = None):
+        self.bgm_dir = Path(bgm_dir or Config.BGM_DIR)
+        self.sample_rate = sample_rate or Config.AUDIO_SAMPLE_RATE
+        self.cache_dir = Config.CACHE_DIR / "bgm"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.cache_dir / "index.json"
+        self._lock = threading.RLock()
+        self.entries = self._load_index()
+
+    def _load_index(self) -> dict:
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == BGM_INDEX_VERSION and data.get("sample_rate") == self.sample_rate:
+                return data["tracks"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable BGM index: {e}")
+        return {}
+
+    def _save_index(self, changed: list = (), removed: list = ()):
+        """
+        Applies this library's changed/removed entries to the shared index file (atomically).
+        Libraries of other directories (or processes) save to the same file, so it is re-read
+        first and only these keys are written, instead of overwriting it with this instance's view.
+        """
+        with _index_lock:
+            entries = self._load_index()
+            for key in changed:
+                entries[key] = self.entries[key]
+            for key in removed:
+                entries.pop(key, None)
+            self.entries = entries
+            tmp_path = self.index_path.with_name(f"{self.index_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": BGM_INDEX_VERSION, "sample_rate": self.sample_rate, "tracks": entries}, f, indent=4)
+            os.replace(tmp_path, self.index_path)
+
+    def _is_current(self, entry: dict, path: Path) -> bool:
+        stat = path.stat()
+        return (entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+                and (self.cache_dir / entry["pcm"]).exists())
+
+    def add(self, path) -> dict:
+        """
+        Indexes one track (e.g. right after an upload) unless it is already up to date.
+        """
+        path = Path(path).resolve()
+        with self._lock:
+            entry = self.entries.get(str(path))
+            if entry and self._is_current(entry, path):
+                return entry
+
+            data = path.read_bytes()
+            digest = hashlib.sha256(data).hexdigest()
+            pcm_name = f"{digest}.npy"
+            pcm_path = self.cache_dir / pcm_name
+            stat = path.stat()
+
+            # Same content under another name (or a touched file): reuse its prepared PCM
+            existing = next((e for e in self.entries.values() if e["hash"] == digest), None)
+            if existing and pcm_path.exists():
+                entry = dict(existing, name=path.name, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            else:
+                entry = self._prepare(path, digest, pcm_path)
+                entry.update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+            self.entries[str(path)] = entry
+            self._save_index(changed=[str(path)])
+            return entry
+
+    def _prepare(self, path: Path, digest: str, pcm_path: Path) -> dict:
+        logger.info(f"Indexing BGM track {path.name}...")
+        pcm = trim_silence(decode_pcm(path, self.sample_rate))
+        loudness = measure_loudness(pcm, self.sample_rate)
+
+        # Normalize to the target loudness without letting peaks clip
+        gain = 10 ** ((Config.BGM_TARGET_LOUDNESS - loudness) / 20)
+        peak = float(np.abs(pcm).max()) if len(pcm) else 0.0
+        if peak * gain > 0.99:
+            gain = 0.99 / peak
+        pcm, loop_start = make_seamless(pcm * np.float32(gain), int(Config.BGM_LOOP_CROSSFADE * self.sample_rate))
+
+        tmp_path = pcm_path.with_name(f"{pcm_path.stem}.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, np.round(np.clip(pcm, -1.0, 1.0) * 32767).astype(np.int16))
+        os.replace(tmp_path, pcm_path)
+
+        try:
+            duration_us = probe_audio(path)["duration_us"]
+        except ValueError:
+            # Not an MP3 (ffmpeg decoded it anyway): fall back to the decoded length
+            duration_us = len(pcm) * 1_000_000 // self.sample_rate
+        return {
+            "name": path.name,
+            "hash": digest,
+            "pcm": pcm_path.name,
+            "duration_us": duration_us,
+            "loudness_db": loudness,
+            "gain_db": float(20 * np.log10(gain)),
+            "samples": len(pcm),
+            "loop_start": loop_start,
+        }
+
+    def refresh(self, pattern: str = "*.mp3") -> list[dict]:
+        """
+        Indexes new or changed tracks in the directory and forgets deleted ones.
+        Only tracks that were never seen (by content) are decoded; unchanged ones are only
+        stat()ed, so this is cheap enough to call on every UI rerun.
+        """
+        with self._lock:
+            present = set()
+            for path in sorted(self.bgm_dir.glob(pattern)):
+                try:
+                    self.add(path)
+                    present.add(str(path.resolve()))
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Skipping unreadable BGM track {path.name}: {e}")
+            removed = [key for key in self.entries if Path(key).parent == self.bgm_dir.resolve() and key not in present]
+            if removed:
+                for key in removed:
+                    del self.entries[key]
+                self._save_index(removed=removed)
+            return self.tracks()
+
+    def tracks(self) -> list[dict]:
+        """
+        Indexed tracks of this library's directory, with their 'path'.
+        """
+        with self._lock:
+            return [dict(entry, path=key) for key, entry in sorted(self.entries.items())
+                    if Path(key).parent == self.bgm_dir.resolve()]
+
+    def load(self, entry: dict) -> np.ndarray:
+        """
+        The track's normalized int16 stereo PCM, memory-mapped (nothing is decoded).
+        """
+        return np.load(self.cache_dir / entry["pcm"], mmap_mode="r")
+
+    def render(self, entry: dict, duration: float, volume: float = 1.0) -> np.ndarray:
+        """
+        Returns exactly `duration` seconds of the track as float32 stereo, looping seamlessly
+        (head once, then the loop body repeated) and scaled by `volume`.
+        """
+        pcm = self.load(entry)
+        total = int(round(duration * self.sample_rate))
+        if not len(pcm):
+            return np.zeros((total, 2), dtype=np.float32)
+        if total <= len(pcm):
+            parts = [pcm[:total]]
+        else:
+            body = pcm[entry["loop_start"]:]
+            remaining = total - len(pcm)
+            parts = [pcm] + [body] * (remaining // len(body)) + [body[:remaining % len(body)]]
+        out = np.empty((total, 2), dtype=np.float32)
+        position = 0
+        scale = np.float32(volume / 32767)
+        for part in parts:
+            np.multiply(part, scale, out=out[position:position + len(part)])
+            position += len(part)
+        return out
+
+_libraries = {}
+_libraries_lock = threading.Lock()
+# Serializes read-merge-write cycles of the shared index file within this process
+_index_lock = threading.Lock()
+
+def get_bgm_library(bgm_dir: Path = None) -> BGMLibrary:
+    """
+    Process-wide library per directory, indexed on first use.
+    """
+    key = str(Path(bgm_dir or Config.BGM_DIR).resolve())
+    with _libraries_lock:
+        library = _libraries.get(key)
+        if library is None:
+            library = BGMLibrary(key)
+            library.refresh()
+            _libraries[key] = library
+        return library
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from .config import Config
+from .logger import logger
+
+class DiskCache:
+    """
+    Content-addressed file cache stored under Config.CACHE_DIR/<name>.
+    Entries are looked up by a hash of their key parts and evicted least-recently-used
+    (a hit refreshes the entry's mtime) once the cache grows past its size bound.
+    """
+    def __init__(self, name: str, max_bytes: int = None, max_entries: int = None, suffix: str = ""):
+        self.name = name
+        self.cache_dir = Config.CACHE_DIR / name
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts) -> str:
+        """
+        Hashes any JSON-serializable key parts into a stable cache key.
+        """
+        raw = json.dumps(parts, sort_keys=True, default=str, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        return self.cache_dir / f"{key}{self.suffix}"
+
+    def _meta_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.meta.json"
+
+    def get(self, key: str, *fallback_keys: str, valid=None) -> Path:
+        """
+        Returns the cached file path for the first of `key`, *fallback_keys that exists, or None on a miss.
+        `valid(key, path)` can reject an existing entry (e.g. expired or incomplete); the next key is
+        tried then. A lookup counts as a single hit or miss regardless of how many keys were tried.
+        """
+        for candidate in (key,) + fallback_keys:
+            path = self.path_for(candidate)
+            if path.exists() and path.stat().st_size > 0 and (valid is None or valid(candidate, path)):
+                # Touch so LRU eviction keeps recently used entries
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                self.hits += 1
+                return path
+        self.misses += 1
+        return None
+
+    def get_meta(self, key: str) -> dict:
+        """
+        Returns the JSON metadata stored next to an entry (or None).
+        """
+        meta_path = self._meta_path(key)
+        if not meta_path.exists():
+            return None
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            logger.warning(f"Corrupt {self.name} cache metadata {meta_path.name}: {e}")
+            return None
+
+    def put_bytes(self, key: str, data: bytes, meta: dict = None) -> Path:
+        path = self.path_for(key)
+        tmp_path = path.with_name(path.name + f".{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        return self._commit(key, tmp_path, meta)
+
+    def put_file(self, key: str, source_path, meta: dict = None) -> Path:
+        path = self.path_for(key)
+        tmp_path = path.with_name(path.name + f".{os.getpid()}.{threading.get_ident()}.tmp")
+        shutil.copyfile(source_path, tmp_path)
+        return self._commit(key, tmp_path, meta)
+
+    def _commit(self, key: str, tmp_path: Path, meta: dict = None) -> Path:
+        # Atomic rename so concurrent readers never see a half-written entry
+        path = self.path_for(key)
+        if meta is not None:
+            with open(self._meta_path(key), "w", encoding="utf-8") as f:
+                json.dump(meta, f)
+        os.replace(tmp_path, path)
+        self.evict()
+        return path
+
+    def delete(self, key: str):
+        """
+        Removes an entry (and its metadata) if present.
+        """
+        for path in (self.path_for(key), self._meta_path(key)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def evict(self):
+        """
+        Deletes least-recently-used entries until the cache fits its size bounds.
+        """
+        if self.max_bytes is None and self.max_entries is None:
+            return
+
+        with self._lock:
+            entries = []
+            for item in self.cache_dir.iterdir():
+                if item.name.endswith(".meta.json") or item.name.endswith(".tmp"):
+                    continue
+                try:
+                    stat = item.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, item))
+
+            entries.sort()
+            total_bytes = sum(size for _, size, _ in entries)
+            count = len(entries)
+
+            for _, size, item in entries:
+                over_bytes = self.max_bytes is not None and total_bytes > self.max_bytes
+                over_count = self.max_entries is not None and count > self.max_entries
+                if not (over_bytes or over_count):
+                    break
+                key = item.name[:len(item.name) - len(self.suffix)] if self.suffix else item.name
+                try:
+                    item.unlink()
+                    meta_path = self._meta_path(key)
+                    if meta_path.exists():
+                        meta_path.unlink()
+                except OSError as e:
+                    logger.warning(f"Failed to evict {item}: {e}")
+                    continue
+                total_bytes -= size
+                count -= 1
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -1,23 +1,21 @@
 import shutil
+import time
 from .config import Config
 from .logger import logger
 
-def cleanup_temp():
+def cleanup_stale_workspaces(max_age: float = None):
     """
-    Deletes all files in the temp directory.
+    Deletes job workspaces under the temp directory that were not modified for `max_age`
+    seconds (e.g. left behind by Streamlit sessions that were closed mid-job).
     """
-    temp_dir = Config.TEMP_DIR
-    if not temp_dir.exists():
+    max_age = Config.WORKSPACE_MAX_AGE if max_age is None else max_age
+    if not Config.TEMP_DIR.exists():
         return
-
-    logger.info(f"Cleaning up temp files in {temp_dir}...")
-    try:
-        # Delete only files inside, keep the dir or recreate it
-        for item in temp_dir.iterdir():
-            if item.is_file():
-                item.unlink()
-            elif item.is_dir():
-                shutil.rmtree(item)
-        logger.info("Cleanup complete.")
-    except Exception as e:
-        logger.error(f"Error during cleanup: {e}")
+    cutoff = time.time() - max_age
+    for item in Config.TEMP_DIR.iterdir():
+        try:
+            if item.is_dir() and item.stat().st_mtime < cutoff:
+                shutil.rmtree(item, ignore_errors=True)
+                logger.info(f"Removed stale workspace {item.name}.")
+        except OSError as e:
+            logger.warning(f"Could not remove stale workspace {item.name}: {e}")
@@ -9,7 +9,13 @@ class Config:
     BASE_DIR = Path(__file__).resolve().parent.parent.parent
     ASSETS_DIR = BASE_DIR / "assets"
     OUTPUT_DIR = BASE_DIR / "output"
+    # Per-job checkpoints (manifest + artifacts), kept until deleted so jobs can be resumed
+    JOBS_DIR = OUTPUT_DIR / "jobs"
     TEMP_DIR = BASE_DIR / "temp"
+    # Job workspaces under TEMP_DIR untouched for this long (seconds) are deleted by the UI
+    WORKSPACE_MAX_AGE = int(os.getenv("WORKSPACE_MAX_AGE", str(24 * 3600)))
+    # Persistent caches live outside TEMP_DIR so workspace cleanup never wipes them
+    CACHE_DIR = Path(os.getenv("CACHE_DIR", BASE_DIR / "cache"))
     BGM_DIR = ASSETS_DIR / "bgm"
     FONTS_DIR = ASSETS_DIR / "fonts"
     
@@ -18,29 +24,84 @@ class Config:
     SCRIPT_PROVIDER = os.getenv("SCRIPT_PROVIDER", "g4f") 
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
+    # Opt-in memoization of LLM responses keyed on (model, normalized prompt)
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "0") == "1"
+    LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))) # seconds
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "500"))
+    LLM_TIMEOUT = float(os.getenv("LLM_TIMEOUT", "40"))
+    # Hedged requests: start the next model after this many seconds without an answer
+    # ("0" races all models at once). Unset keeps the strict sequential fallback.
+    LLM_HEDGE_DELAY = float(os.getenv("LLM_HEDGE_DELAY")) if os.getenv("LLM_HEDGE_DELAY") else None
     
     # Image Generation
     # "pollinations"
     IMAGE_PROVIDER = os.getenv("IMAGE_PROVIDER", "pollinations")
+    # Number of scene images requested in parallel (one pooled session per job)
+    IMAGE_CONCURRENCY = int(os.getenv("IMAGE_CONCURRENCY", "4"))
+    IMAGE_CACHE_ENABLED = os.getenv("IMAGE_CACHE_ENABLED", "1") == "1"
+    IMAGE_CACHE_MAX_MB = int(os.getenv("IMAGE_CACHE_MAX_MB", "500"))
     
     # Text to Speech
     # "edge-tts"
     TTS_PROVIDER = os.getenv("TTS_PROVIDER", "edge-tts")
     TTS_VOICE = os.getenv("TTS_VOICE", "en-US-ChristopherNeural") # Deep male voice, good for horror
+    TTS_RATE = os.getenv("TTS_RATE", "+0%")
+    TTS_PITCH = os.getenv("TTS_PITCH", "+0Hz")
+    TTS_CACHE_ENABLED = os.getenv("TTS_CACHE_ENABLED", "1") == "1"
+    TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "200"))
 
     # Video Settings
     VIDEO_WIDTH = 1080
     VIDEO_HEIGHT = 1920
     FPS = 24
+
+    # Encoding
+    # "moviepy" (write_videofile), "ffmpeg" (raw frames piped straight into ffmpeg)
+    # or "segments" (scenes encoded in parallel processes, then stream-copy concatenated)
+    RENDER_BACKEND = os.getenv("RENDER_BACKEND", "moviepy")
+    RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", str(os.cpu_count() or 1)))
+    # Rendered scene segments reused across renders when their inputs are unchanged
+    SEGMENT_CACHE_ENABLED = os.getenv("SEGMENT_CACHE_ENABLED", "1") == "1"
+    SEGMENT_CACHE_MAX_MB = int(os.getenv("SEGMENT_CACHE_MAX_MB", "2000"))
+    VIDEO_PRESET = os.getenv("VIDEO_PRESET", "ultrafast")
+    VIDEO_CRF = int(os.getenv("VIDEO_CRF", "23"))
+    VIDEO_THREADS = int(os.getenv("VIDEO_THREADS", "8"))
+    VIDEO_PIX_FMT = os.getenv("VIDEO_PIX_FMT", "yuv420p")
+    AUDIO_BITRATE = os.getenv("AUDIO_BITRATE", "192k")
+    AUDIO_SAMPLE_RATE = 44100
+    # CLI renders scenes while the remaining images are still downloading.
+    # Only used with the "segments" backend; the other backends render after all assets are ready.
+    PIPELINED_RENDER = os.getenv("PIPELINED_RENDER", "1") == "1"
+    # Ready scenes buffered between asset generation and the pipelined renderer
+    RENDER_QUEUE_SCENES = int(os.getenv("RENDER_QUEUE_SCENES", "4"))
+    # Draft previews (Streamlit): reduced size/fps, static backgrounds, cheapest encode
+    DRAFT_WIDTH = int(os.getenv("DRAFT_WIDTH", "540"))
+    DRAFT_HEIGHT = int(os.getenv("DRAFT_HEIGHT", "960"))
+    DRAFT_FPS = int(os.getenv("DRAFT_FPS", "12"))
+    DRAFT_PRESET = os.getenv("DRAFT_PRESET", "ultrafast")
+    DRAFT_CRF = int(os.getenv("DRAFT_CRF", "32"))
+    DRAFT_RENDER_BACKEND = os.getenv("DRAFT_RENDER_BACKEND", "segments")
+    # Max frames buffered between the frame generator and the ffmpeg pipe
+    FFMPEG_QUEUE_FRAMES = int(os.getenv("FFMPEG_QUEUE_FRAMES", "48"))
     
     ENABLE_BGM = True
     BGM_VOLUME = 0.3
-    
+    # BGM tracks are normalized to this gated loudness (dBFS) when indexed, before BGM_VOLUME
+    BGM_TARGET_LOUDNESS = float(os.getenv("BGM_TARGET_LOUDNESS", "-20"))
+    # Seconds of the track's opening crossfaded into its end so loops are seamless
+    BGM_LOOP_CROSSFADE = float(os.getenv("BGM_LOOP_CROSSFADE", "1.0"))
+    # Sidechain ducking of the BGM under speech: depth (dB) and attack/release times (seconds)
+    BGM_DUCK_DB = float(os.getenv("BGM_DUCK_DB", "-10"))
+    BGM_DUCK_ATTACK = float(os.getenv("BGM_DUCK_ATTACK", "0.08"))
+    BGM_DUCK_RELEASE = float(os.getenv("BGM_DUCK_RELEASE", "0.5"))
+
     @classmethod
     def ensure_dirs(cls):
         cls.ASSETS_DIR.mkdir(exist_ok=True)
         cls.OUTPUT_DIR.mkdir(exist_ok=True)
+        cls.JOBS_DIR.mkdir(exist_ok=True)
         cls.TEMP_DIR.mkdir(exist_ok=True)
+        cls.CACHE_DIR.mkdir(parents=True, exist_ok=True)
         cls.BGM_DIR.mkdir(exist_ok=True)
         cls.FONTS_DIR.mkdir(exist_ok=True)
 
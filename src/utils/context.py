@@ -0,0 +1,113 @@
+import dataclasses
+import shutil
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from .config import Config
+
+@dataclass(frozen=True)
+class JobContext:
+    """
+    Immutable settings and isolated workspace of one job.
+    Generators and the compositor read per-job values from here instead of the Config class,
+    so jobs running side by side in one process (e.g. two Streamlit sessions) never share
+    scratch files or see each other's settings. Use with_settings() to derive a changed copy.
+    """
+    job_id: str
+    # Scratch directory for scene images/audio, segments and temp audio of this job only
+    workspace: Path
+    output_dir: Path
+    width: int
+    height: int
+    fps: int
+    render_backend: str
+    video_preset: str
+    video_crf: int
+    tts_voice: str
+    tts_rate: str
+    tts_pitch: str
+    image_concurrency: int
+    llm_cache_enabled: bool
+    enable_bgm: bool
+    bgm_volume: float
+    bgm_dir: Path
+    fonts_dir: Path
+    # Draft preview: static backgrounds and no vignette (see as_draft)
+    draft: bool
+
+    @classmethod
+    def create(cls, job_id: str = None, workspace: Path = None, **settings) -> "JobContext":
+        """
+        New context with defaults read from Config now; `settings` override single fields.
+        The workspace defaults to TEMP_DIR/<job_id> and is created if needed.
+        """
+        job_id = job_id or uuid.uuid4().hex[:12]
+        workspace = Path(workspace) if workspace else Config.TEMP_DIR / job_id
+        workspace.mkdir(parents=True, exist_ok=True)
+        defaults = {
+            "output_dir": Config.OUTPUT_DIR,
+            "width": Config.VIDEO_WIDTH,
+            "height": Config.VIDEO_HEIGHT,
+            "fps": Config.FPS,
+            "render_backend": Config.RENDER_BACKEND,
+            "video_preset": Config.VIDEO_PRESET,
+            "video_crf": Config.VIDEO_CRF,
+            "tts_voice": Config.TTS_VOICE,
+            "tts_rate": Config.TTS_RATE,
+            "tts_pitch": Config.TTS_PITCH,
+            "image_concurrency": Config.IMAGE_CONCURRENCY,
+            "llm_cache_enabled": Config.LLM_CACHE_ENABLED,
+            "enable_bgm": Config.ENABLE_BGM,
+            "bgm_volume": Config.BGM_VOLUME,
+            "bgm_dir": Config.BGM_DIR,
+            "fonts_dir": Config.FONTS_DIR,
+            "draft": False,
+        }
+        defaults.update(settings)
+        return cls(job_id=job_id, workspace=workspace, **defaults)
+
+    @classmethod
+    def default(cls) -> "JobContext":
+        """
+        Context used by components constructed without one: Config values and the shared TEMP_DIR.
+        """
+        return cls.create("default", workspace=Config.TEMP_DIR)
+
+    def with_settings(self, **changes) -> "JobContext":
+        return dataclasses.replace(self, **changes)
+
+    def as_draft(self) -> "JobContext":
+        """
+        Same job and workspace (so its scenes, narration and soundtrack are reused) rendered as
+        a quick preview: Config.DRAFT_* resolution, fps, encoder and backend, simplified effects.
+        The preview is written into the workspace, so cleanup() removes it too.
+        """
+        return self.with_settings(
+            output_dir=self.workspace,
+            width=Config.DRAFT_WIDTH,
+            height=Config.DRAFT_HEIGHT,
+            fps=Config.DRAFT_FPS,
+            render_backend=Config.DRAFT_RENDER_BACKEND,
+            video_preset=Config.DRAFT_PRESET,
+            video_crf=Config.DRAFT_CRF,
+            draft=True,
+        )
+
+    def path(self, name: str) -> Path:
+        """
+        Path of a scratch file inside this job's workspace.
+        """
+        return self.workspace / name
+
+    def cleanup(self):
+        """
+        Removes this job's workspace (never touches other jobs' files).
+        """
+        if self.workspace == Config.TEMP_DIR:
+            # Shared scratch directory of the default context: only its loose files, since the
+            # subdirectories are other jobs' workspaces
+            for item in self.workspace.iterdir():
+                if item.is_file():
+                    item.unlink(missing_ok=True)
+        elif self.workspace.exists():
+            shutil.rmtree(self.workspace, ignore_errors=True)
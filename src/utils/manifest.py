@@ -0,0 +1,129 @@
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+from .config import Config
+from .logger import logger
+
+class JobManifest:
+    """
+    Checkpoint record of a job stored as manifest.json in its own directory under Config.JOBS_DIR.
+    Each stage lists the artifacts it produced (path + size); an artifact counts as valid only
+    while the file still exists with the recorded size, so a resumed job redoes exactly the
+    missing or truncated outputs.
+    """
+    def __init__(self, job_dir: Path, data: dict):
+        self.job_dir = Path(job_dir)
+        self.data = data
+
+    @property
+    def job_id(self) -> str:
+        return self.data["job_id"]
+
+    @property
+    def topic(self) -> str:
+        return self.data.get("topic")
+
+    @classmethod
+    def create(cls, topic: str = None, job_id: str = None) -> "JobManifest":
+        job_id = job_id or datetime.now().strftime("job_%Y%m%d_%H%M%S_%f")
+        job_dir = Config.JOBS_DIR / job_id
+        job_dir.mkdir(parents=True, exist_ok=True)
+        manifest = cls(job_dir, {"job_id": job_id, "topic": topic, "created": time.time(), "stages": {}})
+        manifest.save()
+        return manifest
+
+    @classmethod
+    def load(cls, job_id: str) -> "JobManifest":
+        """
+        Loads an existing job by id (or by path to its directory). Raises FileNotFoundError.
+        """
+        job_dir = Path(job_id) if Path(job_id).is_dir() else Config.JOBS_DIR / job_id
+        with open(job_dir / "manifest.json", "r", encoding="utf-8") as f:
+            return cls(job_dir, json.load(f))
+
+    @classmethod
+    def open(cls, job_id: str, topic: str = None) -> "JobManifest":
+        """
+        Loads the job if it exists, otherwise creates it.
+        """
+        if (Config.JOBS_DIR / job_id / "manifest.json").exists():
+            return cls.load(job_id)
+        return cls.create(topic, job_id)
+
+    def save(self):
+        # Write-then-rename so a crash never leaves a half-written manifest
+        path = self.job_dir / "manifest.json"
+        tmp_path = path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, indent=4)
+        os.replace(tmp_path, path)
+
+    def path(self, name: str) -> Path:
+        """
+        Absolute path of an artifact file inside the job directory.
+        """
+        return self.job_dir / name
+
+    def _relative(self, path) -> str:
+        path = Path(path)
+        try:
+            return str(path.resolve().relative_to(self.job_dir.resolve()))
+        except ValueError:
+            return str(path.resolve())
+
+    def _resolve(self, stored: str) -> Path:
+        path = Path(stored)
+        return path if path.is_absolute() else self.job_dir / path
+
+    def record(self, stage: str, key: str, path):
+        """
+        Records (or replaces) one artifact of a stage and saves the manifest.
+        """
+        path = Path(path)
+        entry = self.data["stages"].setdefault(stage, {"complete": False, "artifacts": {}})
+        entry["artifacts"][str(key)] = {"path": self._relative(path), "size": path.stat().st_size}
+        self.save()
+
+    def reset(self, stage: str):
+        """
+        Forgets a stage (e.g. images recorded for a script that is being regenerated).
+        """
+        if self.data["stages"].pop(stage, None) is not None:
+            self.save()
+
+    def complete(self, stage: str):
+        entry = self.data["stages"].setdefault(stage, {"complete": False, "artifacts": {}})
+        entry["complete"] = True
+        entry["completed_at"] = time.time()
+        self.save()
+
+    def artifact(self, stage: str, key) -> Path:
+        """
+        Returns the artifact's path if it is recorded and still valid, else None.
+        """
+        entry = self.data["stages"].get(stage)
+        if not entry:
+            return None
+        info = entry["artifacts"].get(str(key))
+        if not info:
+            return None
+        path = self._resolve(info["path"])
+        try:
+            if path.stat().st_size == info["size"] and info["size"] > 0:
+                return path
+        except OSError:
+            pass
+        logger.warning(f"Job {self.job_id}: artifact {stage}/{key} is missing or invalid, will redo it.")
+        return None
+
+    def is_complete(self, stage: str, keys=None) -> bool:
+        """
+        True if the stage finished and all of its artifacts (or the given `keys`) are still valid.
+        """
+        entry = self.data["stages"].get(stage)
+        if not entry or not entry.get("complete"):
+            return False
+        keys = entry["artifacts"].keys() if keys is None else keys
+        return all(self.artifact(stage, key) for key in keys)
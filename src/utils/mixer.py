@@ -0,0 +1,131 @@
+import os
+import wave
+from pathlib import Path
+import numpy as np
+from .bgm import decode_pcm, get_bgm_library
+from .config import Config
+from .logger import logger
+
+# Ducking is computed at this control rate, then interpolated to the sample rate
+CONTROL_RATE = 100
+# Narration blocks louder than this (dBFS) count as speech when ducking from energy
+SPEECH_THRESHOLD_DB = -40.0
+
+def speech_mask_from_words(words: list[dict], blocks: int, pad: float = 0.05) -> np.ndarray:
+    """
+    Boolean speech activity per control block from timed words ({"start", "end"} seconds).
+    """
+    mask = np.zeros(blocks, dtype=bool)
+    if not words:
+        return mask
+    starts = np.array([word["start"] for word in words]) - pad
+    ends = np.array([word["end"] for word in words]) + pad
+    first = np.clip(np.floor(starts * CONTROL_RATE).astype(int), 0, blocks)
+    last = np.clip(np.ceil(ends * CONTROL_RATE).astype(int), 0, blocks)
+    # Interval union via a difference array: +1 at each start, -1 after each end
+    edges = np.zeros(blocks + 1, dtype=np.int32)
+    np.add.at(edges, first, 1)
+    np.add.at(edges, last, -1)
+    return np.cumsum(edges[:-1]) > 0
+
+def speech_mask_from_energy(pcm: np.ndarray, sample_rate: int, blocks: int) -> np.ndarray:
+    """
+    Boolean speech activity per control block from the narration's RMS level.
+    """
+    block = sample_rate // CONTROL_RATE
+    usable = min(len(pcm) // block, blocks) * block
+    energy = np.square(pcm[:usable], dtype=np.float32).mean(axis=1).reshape(-1, block).mean(axis=1)
+    with np.errstate(divide="ignore"):
+        active = 10 * np.log10(energy) > SPEECH_THRESHOLD_DB
+    mask = np.zeros(blocks, dtype=bool)
+    mask[:len(active)] = active
+    return mask
+
+def ducking_gain(mask: np.ndarray, duck_db: float, attack: float, release: float) -> np.ndarray:
+    """
+    Per-block BGM gain: 1.0 in silence, 10^(duck_db/20) under speech, moving towards the
+    target at most 1/attack (down) or 1/release (up) of the full range per second.
+    """
+    floor = 10 ** (duck_db / 20)
+    target = np.where(mask, floor, 1.0)
+    down = (1.0 - floor) / max(attack * CONTROL_RATE, 1.0)
+    up = (1.0 - floor) / max(release * CONTROL_RATE, 1.0)
+
+    gain = np.empty_like(target)
+    current = 1.0
+    # Control-rate loop (100 steps per second of audio); the sample-rate work stays vectorized
+    for i, wanted in enumerate(target):
+        if wanted < current:
+            current = max(wanted, current - down)
+        else:
+            current = min(wanted, current + up)
+        gain[i] = current
+    return gain
+
+def write_wav(path, pcm: np.ndarray, sample_rate: int) -> str:
+    """
+    Writes float stereo PCM as 16-bit WAV (atomically).
+    """
+    path = Path(path)
+    tmp_path = path.with_name(f"{path.stem}.{os.getpid()}.tmp.wav")
+    data = np.round(np.clip(pcm, -1.0, 1.0) * 32767).astype("<i2")
+    with wave.open(str(tmp_path), "wb") as f:
+        f.setnchannels(pcm.shape[1])
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(data.tobytes())
+    os.replace(tmp_path, path)
+    return str(path)
+
+class AudioMixer:
+    """
+    Offline soundtrack mixer: narration and BGM are mixed into one PCM buffer with vectorized
+    numpy and written once as a WAV that the encoder muxes directly (no lazy MoviePy audio
+    graph at render time). The BGM is sidechain-ducked under speech, detected from the
+    narration's word timings when available, otherwise from its energy.
+    """
+    def __init__(self, sample_rate: int = None, duck_db: float = None, attack: float = None, release: float = None):
+        self.sample_rate = sample_rate or Config.AUDIO_SAMPLE_RATE
+        self.duck_db = Config.BGM_DUCK_DB if duck_db is None else duck_db
+        self.attack = Config.BGM_DUCK_ATTACK if attack is None else attack
+        self.release = Config.BGM_DUCK_RELEASE if release is None else release
+
+    def mix(self, narration_path, duration: float, bgm_path=None, bgm_volume: float = 1.0,
+            words: list[dict] = None, bgm_dir: Path = None) -> np.ndarray:
+        """
+        Returns `duration` seconds of float32 stereo: the narration plus the (ducked) BGM.
+        """
+        total = int(round(duration * self.sample_rate))
+        out = np.zeros((total, 2), dtype=np.float32)
+
+        narration = decode_pcm(narration_path, self.sample_rate)[:total]
+        out[:len(narration)] = narration
+
+        if bgm_path:
+            library = get_bgm_library(bgm_dir)
+            bgm = library.render(library.add(bgm_path), duration, volume=bgm_volume)
+
+            blocks = int(np.ceil(total / self.sample_rate * CONTROL_RATE)) + 1
+            if words:
+                mask = speech_mask_from_words(words, blocks)
+            else:
+                mask = speech_mask_from_energy(narration, self.sample_rate, blocks)
+            gain = ducking_gain(mask, self.duck_db, self.attack, self.release)
+
+            # Control-rate gain interpolated to every sample, then one fused multiply-add
+            times = np.arange(total, dtype=np.float32) * np.float32(CONTROL_RATE / self.sample_rate)
+            sample_gain = np.interp(times, np.arange(blocks, dtype=np.float32), gain).astype(np.float32)
+            out += bgm * sample_gain[:, None]
+
+        # Normalize instead of clipping if narration + music overshoot full scale
+        peak = float(np.abs(out).max()) if total else 0.0
+        if peak > 1.0:
+            logger.info(f"Mix peaked at {peak:.2f}, scaling down.")
+            out /= peak
+        return out
+
+    def mix_to_file(self, output_path, narration_path, duration: float, **kwargs) -> str:
+        pcm = self.mix(narration_path, duration, **kwargs)
+        path = write_wav(output_path, pcm, self.sample_rate)
+        logger.info(f"Mixed soundtrack: {path}")
+        return path
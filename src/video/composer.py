@@ -1,15 +1,33 @@
-from moviepy.editor import ImageClip, AudioFileClip, CompositeVideoClip, concatenate_videoclips, CompositeAudioClip, vfx
-import moviepy.audio.fx.all as afx
+from moviepy.editor import ImageClip, AudioFileClip, CompositeAudioClip
+from moviepy.audio.AudioClip import AudioArrayClip
+import asyncio
 import os
-import numpy as np
+from pathlib import Path
+from PIL import Image
+from .ffmpeg_writer import FFmpegPipeWriter, mux_audio
+from .kenburns import KenBurnsEngine
+from .segments import SegmentRenderer
+from .text import TextEngine
+from .timeline import CaptionLayer, SceneLayer, Timeline
+from ..utils.audio_probe import audio_duration
+from ..utils.bgm import get_bgm_library
+from ..utils.cache import DiskCache
 from ..utils.config import Config
+from ..utils.context import JobContext
 from ..utils.logger import logger
+from ..utils.mixer import AudioMixer
 
 class VideoCompositor:
-    def __init__(self):
-        self.width = Config.VIDEO_WIDTH
-        self.height = Config.VIDEO_HEIGHT
-        self.fps = Config.FPS
+    def __init__(self, backend: str = None, context: JobContext = None):
+        self.context = context or JobContext.default()
+        self.width = self.context.width
+        self.height = self.context.height
+        self.fps = self.context.fps
+        # "moviepy", "ffmpeg" or "segments" (see Config.RENDER_BACKEND)
+        self.backend = backend or self.context.render_backend
+        # Drafts skip the vignette and the zoom (one resample per scene instead of per frame)
+        self.vignette_opacity = None if self.context.draft else 0.7
+        self.zoom_ratio = 1.0 if self.context.draft else 1.15
 
     def resize_to_fill(self, clip: ImageClip) -> ImageClip:
         """
@@ -49,173 +67,313 @@ class VideoCompositor:
                 height=target_h
             )
 
-    def apply_ken_burns(self, clip: ImageClip, zoom_ratio=1.3) -> ImageClip:
+    def build_scene_layer(self, scene: dict, start: float, duration: float, text_engine: TextEngine = None,
+                          captions: list = None) -> SceneLayer:
         """
-        Applies a slow zoom effect (Ken Burns).
+        Builds one scene's Ken Burns background and karaoke captions.
+        `captions` is [(chunk, start, end)] relative to the scene (see caption_track); without it
+        the scene text is chunked with durations estimated from character counts.
         """
-        w, h = clip.size
-        # Clip is already resized to fill, so w, h should match self.width, self.height
-        duration = clip.duration
-        
-        def resize_func(t):
-            # Slow linear zoom
-            scale = 1 + (zoom_ratio - 1) * (t / duration)
-            return scale
-
-        # Resize and center crop
-        # MoviePy's resize is computationally expensive if done per frame using a function.
-        # An alternative is to just crop a moving window, or simple resize.
-        # Let's try simple resize then center crop.
-        
-        clip_zoomed = clip.resize(resize_func)
-        return clip_zoomed.set_position(('center', 'center'))
+        text_engine = text_engine or TextEngine(context=self.context)
+
+        # Load Image, Resize to Fill Screen (Cover Mode) and prepare the Ken Burns Effect (Zoom In)
+        with Image.open(scene['image']) as image:
+            # Without zoom a single full-frame box keeps the background static (rendered once)
+            boxes = [(0, 0, self.width, self.height)] if self.zoom_ratio == 1.0 else None
+            background = KenBurnsEngine(image, (self.width, self.height), duration, self.fps,
+                                        zoom_end=self.zoom_ratio, boxes=boxes)
+
+        if captions is None:
+            captions = [(chunk, chunk_start, chunk_start + chunk_duration)
+                        for chunk, chunk_start, chunk_duration in text_engine.caption_timings(scene['text'], duration)]
+
+        # Captions (Overlay), rendered once per chunk
+        caption_layers = []
+        for chunk, chunk_start, chunk_end in captions:
+            bitmap = text_engine.render_caption(chunk)
+            if bitmap is not None:
+                caption_layers.append(CaptionLayer(bitmap, chunk_start, chunk_end))
 
-    def add_vignette(self, clip, opacity=0.6):
+        return SceneLayer(start, duration, background, caption_layers)
+
+    def caption_track(self, scenes: list, spans: list[tuple], text_engine: TextEngine) -> list:
         """
-        Adds a dark vignette overlay to the clip.
+        Builds the word-timed caption timeline once for the whole video from the scenes' spoken
+        'words' and hands each scene the chunks overlapping its (start, end) span, relative to
+        the scene start. A chunk crossing a scene cut appears in both scenes (with a negative
+        start in the second, so it doesn't fade in again).
+        Returns None when the scenes carry no word timings.
         """
-        w, h = clip.size
-        
-        # Create a radial gradient mask using numpy
-        x = np.linspace(-1, 1, w)
-        y = np.linspace(-1, 1, h)
-        X, Y = np.meshgrid(x, y)
-        
-        # Calculate radius from center
-        radius = np.sqrt(X**2 + Y**2)
-        
-        # Create mask: 0 at center, 1 at corners
-        # Adjust curve for vignette falloff
-        mask = radius ** 2.5
-        mask = np.clip(mask, 0, 1) * opacity
-        
-        # Create a black image
-        vignette_layer = np.zeros((h, w, 3), dtype=np.uint8) # Black
-        
-        # BUT moviepy needs an ImageClip to overlay.
-        # Simpler: Create a ColorClip('black') and set its mask/alpha.
-        
-        from moviepy.editor import ColorClip, ImageClip
-        
-        # Create an alpha mask array (0=transparent center, 255=opaque corners)
-        alpha_mask = (mask * 255).astype(np.uint8)
-        
-        # We need to make this a proper ImageClip to overlay
-        # Since generating this numpy array for every frame is expensive if done dynamically,
-        # we generate a static image for the vignette and overlay it.
-        
-        # Make an RGBA image
-        vignette_img = np.dstack((vignette_layer, alpha_mask))
-        
-        from PIL import Image
-        pil_vignette = Image.fromarray(vignette_img, 'RGBA')
-        
-        vignette_clip = ImageClip(np.array(pil_vignette)).set_duration(clip.duration)
-        
-        # Composite
-        return CompositeVideoClip([clip, vignette_clip])
+        words = [word for scene in scenes for word in scene.get('words') or []]
+        if not words:
+            return None
+
+        timings = text_engine.word_caption_timings(words)
+        per_scene = []
+        first = 0
+        for scene_start, scene_end in spans:
+            # Chunks are sorted and non-overlapping; skip those that ended before this scene
+            while first < len(timings) and timings[first][2] <= scene_start:
+                first += 1
+            captions = []
+            for chunk, start, end in timings[first:]:
+                if start >= scene_end:
+                    break
+                captions.append((chunk, start - scene_start, end - scene_start))
+            per_scene.append(captions)
+        return per_scene
 
-    def assemble_video(self, scenes: list, output_filename: str = "final_video.mp4", specific_bgm_path: str = None):
+    def build_timeline(self, scenes: list) -> Timeline:
         """
-        Assembles individual scenes into the final video.
-        scenes: list of dicts { 'image': path, 'audio': path, 'text': str, 'duration': float }
+        Lays the scenes out back to back on a flat Timeline: Ken Burns background,
+        vignette and karaoke captions per scene, all drawn in a single pass per frame.
         """
-        video_clips = []
-        
-        logger.info("Assembling video clips...")
-        
-        for i, scene in enumerate(scenes):
-            image_path = scene['image']
-            audio_path = scene['audio']
-            
+        text_engine = TextEngine(context=self.context)
+        spans = []
+        start = 0.0
+        for scene in scenes:
             # Use provided duration (from actual audio file)
             duration = scene.get('duration', 3.0)
-            
-            # Load Image
-            img_clip = ImageClip(image_path).set_duration(duration)
-            
-            # 1. Resize to Fill Screen (Cover Mode)
-            img_clip = self.resize_to_fill(img_clip)
-            
-            # Apply Ken Burns Effect (Zoom In)
-            img_clip = self.apply_ken_burns(img_clip, zoom_ratio=1.15)
-            
-            # Apply Vignette (Dark corners)
-            img_clip = self.add_vignette(img_clip, opacity=0.7)
-            
-            # Set audio for this clip
+            spans.append((start, start + duration))
+            start += duration
+        captions = self.caption_track(scenes, spans, text_engine)
+
+        layers = []
+        for i, (scene, (start, end)) in enumerate(zip(scenes, spans)):
+            layers.append(self.build_scene_layer(scene, start, end - start, text_engine,
+                                                 captions=captions[i] if captions else None))
+
+        # Vignette (Dark corners) is applied to every frame by the timeline itself
+        return Timeline(layers, (self.width, self.height), self.fps, vignette_opacity=self.vignette_opacity)
+
+    def build_scene_audio(self, scenes: list):
+        """
+        Places each scene's voiceover at its scene start. Returns None if no scene has audio.
+        """
+        audio_clips = []
+        start = 0.0
+        for scene in scenes:
+            audio_path = scene.get('audio')
             if audio_path and os.path.exists(audio_path):
-                scene_audio = AudioFileClip(audio_path)
-                img_clip = img_clip.set_audio(scene_audio)
-            
-            video_clips.append(img_clip)
-
-        # Combine video clips
-        # method="compose" is safer but slower.
-        final_video = concatenate_videoclips(video_clips, method="compose")
-        
-        # Note: Audio is already embedded in each clip, so final_video will have the concatenated audio
-        
-        # Add Captions (Overlay)
-        from .text import TextEngine
-        text_engine = TextEngine()
-        
-        # Add text to each clip before they were concatenated
-        clips_with_text = []
-        for clip, scene in zip(video_clips, scenes):
-             text = scene['text']
-             text_clips = text_engine.create_karaoke_clip(text, clip.duration)
-             
-             if text_clips:
-                 layers = [clip] + text_clips
-                 composite = CompositeVideoClip(layers).set_duration(clip.duration)
-                 clips_with_text.append(composite)
-             else:
-                 clips_with_text.append(clip)
-                 
-        final_video = concatenate_videoclips(clips_with_text, method="compose")
-        
-        # Add BGM if available
+                audio_clips.append(AudioFileClip(audio_path).set_start(start))
+            start += scene.get('duration', 3.0)
+
+        if not audio_clips:
+            return None
+        return CompositeAudioClip(audio_clips).set_duration(start)
+
+    def pick_bgm(self, specific_bgm_path: str = None) -> Path:
+        """
+        Returns the specific BGM track, or a random readable one from the library, or None
+        (BGM disabled or no tracks).
+        """
         import random
-        # Search in BGM_DIR
-        bgm_files = list(Config.BGM_DIR.glob("*.mp3"))
+        if not self.context.enable_bgm:
+            return None
+        if specific_bgm_path and os.path.exists(specific_bgm_path):
+            return Path(specific_bgm_path)
+        # Pick from the BGM_DIR index (built once per process, only readable tracks)
+        tracks = get_bgm_library(self.context.bgm_dir).tracks()
+        return Path(random.choice(tracks)["path"]) if tracks else None
+
+    def add_background_music(self, audio, duration: float, specific_bgm_path: str = None):
+        """
+        Mixes a (specific or random) BGM track under `audio`. Returns the resulting audio clip.
+        """
+        bgm_path = self.pick_bgm(specific_bgm_path)
         
-        bgm_path = None
-        if Config.ENABLE_BGM:
-            if specific_bgm_path and os.path.exists(specific_bgm_path):
-                bgm_path = Path(specific_bgm_path)
-            elif bgm_files:
-                bgm_path = random.choice(bgm_files)
+        if not bgm_path:
+            logger.info("No BGM found in assets/bgm.")
+            return audio
+
+        logger.info(f"Adding background music: {bgm_path}")
+        library = get_bgm_library(self.context.bgm_dir)
+        # No-op for indexed tracks; a specific track outside the library is prepared once
+        entry = library.add(bgm_path)
+
+        # Loudness-normalized PCM from the memory-mapped index, looped seamlessly to the video
+        # duration and scaled to the BGM volume (no decode, audio_loop or volumex at render time)
+        bgm = library.render(entry, duration, volume=self.context.bgm_volume)
+        bgm_clip = AudioArrayClip(bgm, fps=library.sample_rate)
         
-        if bgm_path:
-            logger.info(f"Adding background music: {bgm_path}")
-            bgm_clip = AudioFileClip(str(bgm_path))
-            
-            # Loop bgm to match video duration
-            if bgm_clip.duration < final_video.duration:
-                bgm_clip = afx.audio_loop(bgm_clip, duration=final_video.duration)
-            else:
-                bgm_clip = bgm_clip.subclip(0, final_video.duration)
-                
-            # Lower volume
-            bgm_clip = bgm_clip.volumex(Config.BGM_VOLUME)
-            
-            # Combine audio (Voiceover + BGM)
-            final_audio = CompositeAudioClip([final_video.audio, bgm_clip])
-            final_video = final_video.set_audio(final_audio)
+        # Combine audio (Voiceover + BGM)
+        audio_layers = [audio, bgm_clip] if audio else [bgm_clip]
+        return CompositeAudioClip(audio_layers).set_duration(duration)
+
+    def fit_scenes_to_narration(self, scenes: list, narration_duration: float) -> list:
+        """
+        Returns copies of `scenes` whose durations follow their aligned 'start' times (when the
+        scenes carry them) so every cut lands exactly on the narration, with the last scene
+        running to the end of the narration track.
+        """
+        fitted = [dict(scene) for scene in scenes]
+        if not fitted:
+            return fitted
+        if all('start' in scene for scene in fitted):
+            for scene, following in zip(fitted, fitted[1:]):
+                scene['duration'] = following['start'] - scene['start']
+            last_start = fitted[-1]['start']
         else:
-            logger.info("No BGM found in assets/bgm.")
+            last_start = sum(scene.get('duration', 3.0) for scene in fitted[:-1])
+        fitted[-1]['duration'] = max(narration_duration - last_start, fitted[-1].get('duration', 0.0))
+        return fitted
+
+    def prepare_audio(self, scenes: list, specific_bgm_path: str = None, master_audio_path: str = None,
+                      need_clip: bool = False) -> tuple:
+        """
+        Builds the soundtrack (master narration or per-scene audio, plus BGM).
+        Returns (scenes, audio, audio_source, narration): the scenes fitted to the narration,
+        the audio clip, what finalize_video() should mux and the clip the caller must close
+        (or None). With a master narration, the BGM is mixed and ducked under the speech by
+        AudioMixer into one WAV that is muxed directly; unless `need_clip` is set (MoviePy
+        muxing), no audio clip is opened at all.
+        """
+        narration = None
+        if master_audio_path:
+            scenes = self.fit_scenes_to_narration(scenes, audio_duration(master_audio_path))
+            bgm_path = self.pick_bgm(specific_bgm_path)
+            if bgm_path is None:
+                logger.info("No BGM found in assets/bgm.")
+                # Without BGM the narration file is muxed as is, no decode/re-write pass
+                audio_source = master_audio_path
+            else:
+                logger.info(f"Mixing background music: {bgm_path}")
+                total_duration = sum(scene.get('duration', 3.0) for scene in scenes)
+                # Aligned word timings drive the ducking; the mixer falls back to narration energy
+                words = [word for scene in scenes for word in scene.get('words') or []]
+                # Named after its inputs, so a draft and the final render of a job share one mix. The
+                # narration's size/mtime and the word timings catch a re-synthesized file at the same path.
+                narration_stat = os.stat(master_audio_path)
+                key = DiskCache.make_key(
+                    str(master_audio_path), narration_stat.st_size, narration_stat.st_mtime_ns,
+                    [(word['start'], word['end']) for word in words],
+                    str(bgm_path), self.context.bgm_volume, total_duration
+                )
+                soundtrack_path = self.context.path(f"soundtrack_{key[:16]}.wav")
+                if soundtrack_path.exists():
+                    audio_source = str(soundtrack_path)
+                else:
+                    audio_source = AudioMixer().mix_to_file(
+                        soundtrack_path, master_audio_path, total_duration,
+                        bgm_path=bgm_path, bgm_volume=self.context.bgm_volume, words=words,
+                        bgm_dir=self.context.bgm_dir,
+                    )
+            if not need_clip:
+                return scenes, None, audio_source, None
+
+            narration = AudioFileClip(str(audio_source))
+            return scenes, narration, audio_source, narration
+
+        audio = self.build_scene_audio(scenes)
+        total_duration = sum(scene.get('duration', 3.0) for scene in scenes)
+        audio = self.add_background_music(audio, total_duration, specific_bgm_path)
+        return scenes, audio, audio, narration
+
+    def assemble_video(self, scenes: list, output_filename: str = "final_video.mp4", specific_bgm_path: str = None,
+                       master_audio_path: str = None):
+        """
+        Assembles individual scenes into the final video.
+        scenes: list of dicts { 'image': path, 'audio': path, 'text': str, 'duration': float }
+        With `master_audio_path`, one continuous narration track is used instead of per-scene
+        'audio' files and the scenes are cut to their aligned timestamps ('start').
+        """
+        logger.info("Assembling video clips...")
+        
+        scenes, audio, audio_source, narration = self.prepare_audio(
+            scenes, specific_bgm_path, master_audio_path, need_clip=self.backend not in ("ffmpeg", "segments")
+        )
 
-        output_path = Config.OUTPUT_DIR / output_filename
-        logger.info(f"Rendering final video to {output_path}...")
+        output_path = self.context.output_dir / output_filename
+        logger.info(f"Rendering final video to {output_path} ({self.backend} backend)...")
         
-        final_video.write_videofile(
-            str(output_path),
-            fps=self.fps,
-            codec='libx264',
-            audio_codec='aac',
-            threads=8,
-            preset='ultrafast'
+        try:
+            if self.backend == "segments":
+                # Each scene encoded in its own process, then stream-copy concatenated
+                video_only_path = output_path.with_name(output_path.stem + ".video.mp4")
+                SegmentRenderer(self).render(scenes, video_only_path)
+                self.finalize_video(video_only_path, audio_source, output_path)
+            elif self.backend == "ffmpeg":
+                self.render_with_ffmpeg(self.build_timeline(scenes), audio_source, output_path)
+            else:
+                final_video = self.build_timeline(scenes).to_clip()
+                if audio:
+                    final_video = final_video.set_audio(audio)
+                final_video.write_videofile(
+                    str(output_path),
+                    fps=self.fps,
+                    codec='libx264',
+                    audio_codec='aac',
+                    threads=Config.VIDEO_THREADS,
+                    preset=self.context.video_preset,
+                    # MoviePy puts its temp audio next to the cwd by default, shared by every job
+                    temp_audiofile=str(self.context.path(output_path.stem + "_TEMP_audio.m4a")),
+                    ffmpeg_params=["-crf", str(self.context.video_crf), "-pix_fmt", Config.VIDEO_PIX_FMT]
+                )
+        finally:
+            if narration is not None:
+                narration.close()
+        logger.info("Video rendering complete!")
+        return str(output_path)
+
+    async def assemble_streamed(self, timed_scenes: list, ready, output_filename: str = "final_video.mp4",
+                                specific_bgm_path: str = None, master_audio_path: str = None) -> str:
+        """
+        Pipelined assembly: `timed_scenes` carry text and timings but not necessarily images yet;
+        (index, image_path) items arrive in scene order on the bounded `ready` queue while the
+        images are still downloading, and each scene is encoded as a segment as soon as it
+        arrives (see SegmentRenderer.render_stream). Audio is muxed once at the end.
+        """
+        loop = asyncio.get_running_loop()
+        # BGM indexing, narration decoding and mixing must not stall the image downloads on this loop
+        scenes, audio, audio_source, narration = await loop.run_in_executor(
+            None, self.prepare_audio, timed_scenes, specific_bgm_path, master_audio_path
         )
+        output_path = self.context.output_dir / output_filename
+        video_only_path = output_path.with_name(output_path.stem + ".video.mp4")
+        logger.info(f"Rendering final video to {output_path} (pipelined segments)...")
+
+        try:
+            await SegmentRenderer(self).render_stream(scenes, ready, video_only_path)
+            await loop.run_in_executor(None, self.finalize_video, video_only_path, audio_source, output_path)
+        finally:
+            if narration is not None:
+                narration.close()
         logger.info("Video rendering complete!")
         return str(output_path)
+
+    def render_with_ffmpeg(self, timeline: Timeline, audio, output_path):
+        """
+        Streams the timeline's frames straight into ffmpeg, then muxes the audio in a second pass.
+        """
+        output_path = Path(output_path)
+        video_only_path = output_path.with_name(output_path.stem + ".video.mp4")
+
+        writer = FFmpegPipeWriter(video_only_path, (self.width, self.height), self.fps,
+                                  preset=self.context.video_preset, crf=self.context.video_crf)
+        writer.write_clip(timeline.make_frame, timeline.duration)
+        return self.finalize_video(video_only_path, audio, output_path)
+
+    def finalize_video(self, video_only_path, audio, output_path) -> str:
+        """
+        Writes the audio once and muxes it into a video-only file (which is removed afterwards).
+        `audio` may also be the path of an existing audio file, which is muxed directly.
+        """
+        video_only_path, output_path = Path(video_only_path), Path(output_path)
+        audio_path = self.context.path(output_path.stem + ".audio.m4a")
+        try:
+            if audio is None:
+                os.replace(video_only_path, output_path)
+                return str(output_path)
+
+            if isinstance(audio, (str, Path)):
+                mux_audio(video_only_path, audio, output_path)
+                return str(output_path)
+
+            audio.write_audiofile(str(audio_path), fps=Config.AUDIO_SAMPLE_RATE, codec='aac',
+                                  bitrate=Config.AUDIO_BITRATE, logger=None)
+            mux_audio(video_only_path, audio_path, output_path)
+        finally:
+            for temp_file in (video_only_path, audio_path):
+                if temp_file.exists():
+                    temp_file.unlink()
+        return str(output_path)
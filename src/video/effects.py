@@ -0,0 +1,55 @@
+import numpy as np
+
+# (width, height, opacity) -> fixed-point brightness multipliers, shared by every scene of a render
+_vignette_cache = {}
+
+def vignette_scale(width: int, height: int, opacity: float) -> np.ndarray:
+    """
+    Returns the (height, width, 1) uint16 Q8 fixed-point multipliers (256 = unchanged) of a
+    black radial vignette: darkening grows with radius**2.5 from the center (0) to the corners
+    (`opacity`), quantized to 8-bit alpha. Computed once per (resolution, opacity) and cached.
+    """
+    key = (width, height, round(opacity, 4))
+    scale = _vignette_cache.get(key)
+    if scale is not None:
+        return scale
+
+    # Create a radial gradient mask: 0 at center, 1 at corners
+    x = np.linspace(-1, 1, width, dtype=np.float32)
+    y = np.linspace(-1, 1, height, dtype=np.float32)
+    radius = np.sqrt(x[np.newaxis, :] ** 2 + y[:, np.newaxis] ** 2)
+    # Adjust curve for vignette falloff
+    mask = np.clip(radius ** 2.5, 0, 1) * opacity
+
+    # 8-bit alpha of a black overlay, turned into a multiplier for the frame
+    alpha = (mask * 255).astype(np.uint8)
+    scale = np.round((255 - alpha.astype(np.float32)) * 256 / 255).astype(np.uint16)[:, :, np.newaxis]
+    scale.setflags(write=False)
+
+    _vignette_cache[key] = scale
+    return scale
+
+class VignetteFilter:
+    """
+    Frame filter applying a cached vignette with one vectorized multiply.
+    Reuses its scratch and output buffers between frames, so the returned array is only
+    valid until the next call.
+    """
+    def __init__(self, width: int, height: int, opacity: float = 0.6):
+        self.scale = vignette_scale(width, height, opacity)
+        self._scratch = np.empty((height, width, 3), dtype=np.uint16)
+        self._output = np.empty((height, width, 3), dtype=np.uint8)
+
+    def apply(self, frame: np.ndarray, out: np.ndarray = None) -> np.ndarray:
+        """
+        Darkens `frame` into `out` (which may be `frame` itself for an in-place update).
+        """
+        if out is None:
+            out = self._output
+        np.multiply(frame[:, :, :3], self.scale, out=self._scratch)
+        np.right_shift(self._scratch, 8, out=self._scratch)
+        np.copyto(out, self._scratch, casting="unsafe")
+        return out
+
+    def __call__(self, frame: np.ndarray) -> np.ndarray:
+        return self.apply(frame)
@@ -0,0 +1,167 @@
+import os
+import queue
+import subprocess
+import threading
+from collections import deque
+import numpy as np
+from ..utils.config import Config
+from ..utils.logger import logger
+
+def get_ffmpeg_binary() -> str:
+    """
+    Returns the ffmpeg executable MoviePy is configured with (imageio-ffmpeg's by default).
+    """
+    try:
+        from moviepy.config import get_setting
+        return get_setting("FFMPEG_BINARY")
+    except Exception:
+        return "ffmpeg"
+
+def encoder_args(preset: str = None, crf: int = None, threads: int = None, pix_fmt: str = None) -> list[str]:
+    """
+    libx264 arguments from Config. Shared by every backend so segments encoded separately
+    have identical settings.
+    """
+    return [
+        "-c:v", "libx264",
+        "-preset", preset or Config.VIDEO_PRESET,
+        "-crf", str(crf if crf is not None else Config.VIDEO_CRF),
+        "-threads", str(threads if threads is not None else Config.VIDEO_THREADS),
+        "-pix_fmt", pix_fmt or Config.VIDEO_PIX_FMT,
+    ]
+
+def frame_count(duration: float, fps: int) -> int:
+    # Same frame times as MoviePy's iter_frames: np.arange(0, duration, 1 / fps)
+    return int(np.ceil(duration * fps - 1e-9))
+
+class FFmpegPipeWriter:
+    """
+    Encodes raw RGB frames by streaming them into an ffmpeg subprocess over stdin.
+    Frames are handed to a writer thread through a bounded queue, so producing the next
+    frame overlaps with ffmpeg consuming the previous ones without unbounded memory use.
+    """
+    def __init__(self, output_path: str, size: tuple, fps: int, preset: str = None, crf: int = None,
+                 threads: int = None, pix_fmt: str = None, queue_size: int = None):
+        self.output_path = str(output_path)
+        self.width, self.height = size
+        self.fps = fps
+        self.command = [
+            get_ffmpeg_binary(), "-y", "-loglevel", "error",
+            "-f", "rawvideo", "-vcodec", "rawvideo",
+            "-s", f"{self.width}x{self.height}", "-pix_fmt", "rgb24", "-r", str(fps),
+            "-i", "-",
+            "-an",
+        ] + encoder_args(preset, crf, threads, pix_fmt) + [self.output_path]
+        self.queue_size = queue_size or Config.FFMPEG_QUEUE_FRAMES
+
+    def write_frames(self, frames) -> str:
+        """
+        Consumes an iterable of (height, width, 3) uint8 frames and encodes them.
+        Returns the output path; raises IOError if ffmpeg fails.
+        """
+        process = subprocess.Popen(
+            self.command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE,
+        )
+        buffer = queue.Queue(maxsize=self.queue_size)
+        errors = []
+        # stderr is drained continuously: a full pipe would block ffmpeg and then our stdin writes
+        stderr_tail = deque(maxlen=50)
+
+        def drain():
+            for line in process.stderr:
+                stderr_tail.append(line.decode("utf-8", errors="replace"))
+
+        reader = threading.Thread(target=drain, daemon=True)
+        reader.start()
+
+        def pump():
+            while True:
+                data = buffer.get()
+                if data is None:
+                    break
+                if errors:
+                    continue # Keep draining so the producer never blocks on a dead pipe
+                try:
+                    process.stdin.write(data)
+                except (BrokenPipeError, OSError) as e:
+                    errors.append(e)
+            try:
+                process.stdin.close()
+            except OSError:
+                pass
+
+        writer = threading.Thread(target=pump, daemon=True)
+        writer.start()
+
+        try:
+            for frame in frames:
+                if errors:
+                    break
+                # tobytes() copies, so producers may reuse their frame buffers
+                buffer.put(np.ascontiguousarray(frame[:, :, :3], dtype=np.uint8).tobytes())
+        finally:
+            buffer.put(None)
+            writer.join()
+            return_code = process.wait()
+            reader.join()
+            process.stderr.close()
+            stderr = "".join(stderr_tail)
+
+        if return_code != 0 or errors:
+            raise IOError(f"ffmpeg failed writing {self.output_path} (exit {return_code}): {stderr.strip() or errors}")
+        return self.output_path
+
+    def write_clip(self, make_frame, duration: float) -> str:
+        """
+        Encodes `make_frame(t)` sampled at self.fps over `duration` seconds.
+        """
+        frames = (make_frame(i / self.fps) for i in range(frame_count(duration, self.fps)))
+        return self.write_frames(frames)
+
+def mux_audio(video_path: str, audio_path: str, output_path: str) -> str:
+    """
+    Muxes an audio track into an already encoded video (video stream copied, audio to AAC).
+    """
+    command = [
+        get_ffmpeg_binary(), "-y", "-loglevel", "error",
+        "-i", str(video_path), "-i", str(audio_path),
+        "-map", "0:v:0", "-map", "1:a:0",
+        "-c:v", "copy", "-c:a", "aac", "-b:a", Config.AUDIO_BITRATE,
+        "-shortest", "-movflags", "+faststart",
+        str(output_path),
+    ]
+    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    if result.returncode != 0:
+        raise IOError(f"ffmpeg failed muxing {output_path}: {result.stderr.decode('utf-8', errors='replace').strip()}")
+    logger.info(f"Muxed audio into {output_path}")
+    return str(output_path)
+
+def concat_segments(segment_paths: list, output_path: str) -> str:
+    """
+    Joins MP4 segments encoded with identical settings using the concat demuxer (stream copy,
+    no re-encode).
+    """
+    output_path = str(output_path)
+    list_path = output_path + ".segments.txt"
+    with open(list_path, "w", encoding="utf-8") as f:
+        for path in segment_paths:
+            # Concat list syntax: single quotes escaped as '\''
+            escaped = str(path).replace("'", "'\\''")
+            f.write(f"file '{escaped}'\n")
+
+    command = [
+        get_ffmpeg_binary(), "-y", "-loglevel", "error",
+        "-f", "concat", "-safe", "0", "-i", list_path,
+        "-c", "copy",
+        output_path,
+    ]
+    try:
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+    finally:
+        os.remove(list_path)
+    if result.returncode != 0:
+        raise IOError(f"ffmpeg failed concatenating into {output_path}: {result.stderr.decode('utf-8', errors='replace').strip()}")
+    return output_path
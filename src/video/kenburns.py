@@ -0,0 +1,98 @@
+import numpy as np
+from PIL import Image
+from moviepy.editor import VideoClip
+
+def fit_cover(image: Image.Image, size: tuple) -> Image.Image:
+    """
+    Resizes and center-crops a PIL image to exactly `size` (cover mode) in a single resample.
+    Same framing as VideoCompositor.resize_to_fill.
+    """
+    target_w, target_h = size
+    w, h = image.size
+    scale = max(target_w / w, target_h / h)
+    # Source-space window that maps onto the target
+    crop_w, crop_h = target_w / scale, target_h / scale
+    x0 = (w - crop_w) / 2
+    y0 = (h - crop_h) / 2
+    return image.resize((target_w, target_h), Image.LANCZOS, box=(x0, y0, x0 + crop_w, y0 + crop_h))
+
+class KenBurnsEngine:
+    """
+    Zoom/pan renderer for a still image.
+    The image is scaled once at ingest to the largest size the effect needs; each frame is then
+    a single resample of a moving crop window (sub-pixel box, so the motion doesn't jitter).
+    """
+    def __init__(self, image, size: tuple, duration: float, fps: int,
+                 zoom_start: float = 1.0, zoom_end: float = 1.15, pan: tuple = (0.0, 0.0),
+                 boxes=None, resample=Image.BILINEAR):
+        """
+        image: PIL image or RGB numpy array, any size (it is cover-fitted here).
+        zoom_start/zoom_end: magnification at the first/last frame (1.0 = full frame).
+        pan: (x, y) drift in [-1, 1] of the available margin, reached at the last frame.
+        boxes: optional precomputed (n_frames, 4) crop rectangles (x0, y0, x1, y1) in
+               source pixels, overriding zoom/pan.
+        """
+        self.width, self.height = size
+        self.duration = duration
+        self.fps = fps
+        self.resample = resample
+        self.n_frames = max(1, int(np.ceil(duration * fps)))
+
+        if isinstance(image, np.ndarray):
+            image = Image.fromarray(image)
+        image = image.convert("RGB")
+
+        # Pre-scale so that the most zoomed-in window is sampled 1:1 instead of upscaled
+        self.prescale = max(zoom_start, zoom_end, 1.0)
+        source_size = (round(self.width * self.prescale), round(self.height * self.prescale))
+        self.source = fit_cover(image, source_size)
+
+        if boxes is not None:
+            self.boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+        else:
+            self.boxes = self.compute_boxes(zoom_start, zoom_end, pan)
+
+        self._last_index = None
+        self._last_frame = None
+
+    def compute_boxes(self, zoom_start: float, zoom_end: float, pan: tuple) -> np.ndarray:
+        """
+        Precomputes one crop rectangle per frame for a linear zoom (and optional pan).
+        """
+        src_w, src_h = self.source.size
+        times = np.arange(self.n_frames) / self.fps
+        progress = np.clip(times / self.duration, 0.0, 1.0) if self.duration > 0 else np.zeros(self.n_frames)
+
+        zoom = zoom_start + (zoom_end - zoom_start) * progress
+        # At zoom 1.0 the window is the whole (pre-scaled) source, at zoom == prescale it is 1:1
+        win_w = self.width * self.prescale / zoom
+        win_h = self.height * self.prescale / zoom
+
+        # Pan moves the window center by a fraction of the free margin on each side
+        center_x = src_w / 2 + pan[0] * progress * (src_w - win_w) / 2
+        center_y = src_h / 2 + pan[1] * progress * (src_h - win_h) / 2
+
+        return np.stack([
+            center_x - win_w / 2,
+            center_y - win_h / 2,
+            center_x + win_w / 2,
+            center_y + win_h / 2,
+        ], axis=1)
+
+    def frame_index(self, t: float) -> int:
+        return min(max(int(t * self.fps + 1e-6), 0), len(self.boxes) - 1)
+
+    def get_frame(self, t: float) -> np.ndarray:
+        """
+        Returns the RGB frame at time `t` (seconds) as a (height, width, 3) uint8 array.
+        """
+        index = self.frame_index(t)
+        if index != self._last_index:
+            # Crop + resample in one PIL call
+            frame = self.source.resize((self.width, self.height), self.resample, box=tuple(self.boxes[index]))
+            self._last_frame = np.asarray(frame)
+            self._last_index = index
+        return self._last_frame
+
+    def to_clip(self) -> VideoClip:
+        return VideoClip(make_frame=self.get_frame, duration=self.duration)
@@ -0,0 +1,232 @@
+import asyncio
+import hashlib
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from .ffmpeg_writer import FFmpegPipeWriter, concat_segments
+from .text import TextEngine
+from .timeline import Timeline
+from ..utils.cache import DiskCache
+from ..utils.config import Config
+from ..utils.logger import logger
+
+# Bump when the scene renderer changes output for identical inputs
+SEGMENT_RENDER_VERSION = 2
+
+def scene_frame_spans(durations: list, fps: int) -> list[tuple]:
+    """
+    Converts scene durations into (first_frame, frame_count) spans.
+    Boundaries are rounded on the cumulative timeline, so separately encoded segments
+    add up to the same total length as a single render (no drift against the audio).
+    """
+    spans = []
+    start_time = 0.0
+    start_frame = 0
+    for duration in durations:
+        end_time = start_time + duration
+        end_frame = max(int(round(end_time * fps)), start_frame + 1)
+        spans.append((start_frame, end_frame - start_frame))
+        start_time, start_frame = end_time, end_frame
+    return spans
+
+def render_segment(spec: dict) -> str:
+    """
+    Process-pool worker: renders one scene to a video-only MP4 segment.
+    `spec` is a plain dict so it pickles cheaply: scene, frames, output, size, fps, encoder, context.
+    """
+    # Imported here: composer imports this module
+    from .composer import VideoCompositor
+
+    compositor = VideoCompositor(context=spec["context"])
+    compositor.width, compositor.height = spec["size"]
+    compositor.fps = spec["fps"]
+    compositor.zoom_ratio = spec["zoom_ratio"]
+    duration = spec["frames"] / spec["fps"]
+
+    layer = compositor.build_scene_layer(spec["scene"], 0.0, duration, captions=spec["scene"]["captions"])
+    timeline = Timeline([layer], spec["size"], spec["fps"], vignette_opacity=spec["vignette_opacity"])
+
+    writer = FFmpegPipeWriter(spec["output"], spec["size"], spec["fps"], **spec["encoder"])
+    frames = (timeline.make_frame(i / spec["fps"]) for i in range(spec["frames"]))
+    return writer.write_frames(frames)
+
+class SegmentRenderer:
+    """
+    Renders every scene to its own MP4 segment in a process pool (identical encoder settings),
+    joins them with the concat demuxer using stream copy and leaves audio muxing to the caller.
+    Segments are cached by a hash of their inputs, so editing one scene only re-encodes that scene.
+    """
+    def __init__(self, compositor, workers: int = None, use_cache: bool = None):
+        self.compositor = compositor
+        self.workers = workers or Config.RENDER_WORKERS
+        self.segment_dir = compositor.context.path("segments")
+
+        if use_cache is None:
+            use_cache = Config.SEGMENT_CACHE_ENABLED
+        self.cache = None
+        if use_cache:
+            self.cache = DiskCache("segments", max_bytes=Config.SEGMENT_CACHE_MAX_MB * 1024 * 1024, suffix=".mp4")
+
+    def encoder_settings(self) -> dict:
+        # Split the cores between workers instead of letting every x264 instance grab all of them
+        threads = max(1, (os.cpu_count() or 1) // self.workers)
+        return {
+            "preset": self.compositor.context.video_preset,
+            "crf": self.compositor.context.video_crf,
+            "threads": threads,
+            "pix_fmt": Config.VIDEO_PIX_FMT,
+        }
+
+    def build_specs(self, scenes: list, prefix: str = "segment") -> list[dict]:
+        compositor = self.compositor
+        spans = scene_frame_spans([scene.get('duration', 3.0) for scene in scenes], compositor.fps)
+        encoder = self.encoder_settings()
+        self.segment_dir.mkdir(parents=True, exist_ok=True)
+        # Word-timed captions, cut on the same frame grid as the segments
+        captions = compositor.caption_track(
+            scenes,
+            [(first / compositor.fps, (first + frames) / compositor.fps) for first, frames in spans],
+            TextEngine(context=compositor.context)
+        )
+
+        specs = []
+        for i, (scene, (_, frames)) in enumerate(zip(scenes, spans)):
+            specs.append({
+                "index": i,
+                # The image may still be downloading when specs are built for render_stream()
+                "scene": {"image": scene.get('image'), "text": scene['text'],
+                          "captions": captions[i] if captions else None},
+                "frames": frames,
+                # Prefixed with the output name so concurrent renders never share segment files
+                "output": str(self.segment_dir / f"{prefix}_{i:03d}.mp4"),
+                "size": (compositor.width, compositor.height),
+                "fps": compositor.fps,
+                "vignette_opacity": compositor.vignette_opacity,
+                "zoom_ratio": compositor.zoom_ratio,
+                "encoder": encoder,
+                "context": compositor.context,
+            })
+        return specs
+
+    def segment_key(self, spec: dict, text_engine: TextEngine) -> str:
+        """
+        Hashes everything that affects a segment's pixels: image bytes, caption text, timing and style,
+        frame count, effect parameters, resolution and encoder settings (threads excluded).
+        """
+        with open(spec["scene"]["image"], "rb") as f:
+            image_hash = hashlib.sha256(f.read()).hexdigest()
+        encoder = {k: v for k, v in spec["encoder"].items() if k != "threads"}
+        caption_style = (text_engine.font_path, text_engine.fontsize, text_engine.color,
+                         text_engine.stroke_color, text_engine.stroke_width)
+        return DiskCache.make_key(
+            SEGMENT_RENDER_VERSION, image_hash, spec["scene"]["text"], spec["scene"]["captions"], spec["frames"], spec["fps"],
+            spec["size"], spec["vignette_opacity"], spec["zoom_ratio"], caption_style, encoder
+        )
+
+    def render_segments(self, specs: list) -> list[str]:
+        if not specs:
+            return []
+        workers = min(self.workers, len(specs))
+        logger.info(f"Rendering {len(specs)} segments on {workers} processes...")
+        if workers == 1:
+            return [render_segment(spec) for spec in specs]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return list(pool.map(render_segment, specs))
+
+    def render(self, scenes: list, output_path) -> str:
+        """
+        Renders all scenes (cache misses only) and concatenates them into a single video-only
+        file at `output_path`.
+        """
+        specs = self.build_specs(scenes, prefix=Path(output_path).stem)
+        segment_paths = [None] * len(specs)
+        keys = {}
+        to_render = []
+
+        if self.cache:
+            text_engine = TextEngine(context=self.compositor.context)
+            for spec in specs:
+                keys[spec["index"]] = self.segment_key(spec, text_engine)
+                cached = self.cache.get(keys[spec["index"]])
+                if cached:
+                    segment_paths[spec["index"]] = str(cached)
+                else:
+                    to_render.append(spec)
+            logger.info(f"Segment cache: {len(specs) - len(to_render)}/{len(specs)} scenes reused.")
+        else:
+            to_render = specs
+
+        rendered = self.render_segments(to_render)
+        for spec, path in zip(to_render, rendered):
+            segment_paths[spec["index"]] = path
+        return self._join(segment_paths, list(zip(to_render, rendered)), keys, output_path)
+
+    def _join(self, segment_paths: list, rendered: list, keys: dict, output_path) -> str:
+        """
+        Concatenates the segments and moves the freshly rendered ones ((spec, path) pairs) into the cache.
+        """
+        try:
+            return concat_segments(segment_paths, output_path)
+        finally:
+            # Store new segments only after the concat, so eviction can't remove one we still need
+            for spec, path in rendered:
+                if self.cache and Path(path).exists():
+                    self.cache.put_file(keys[spec["index"]], path)
+                Path(path).unlink(missing_ok=True)
+
+    async def render_stream(self, scenes: list, ready: asyncio.Queue, output_path) -> str:
+        """
+        Pipelined variant of render(): `scenes` are fully timed but their images may still be
+        downloading. (index, image_path) items arrive on the bounded `ready` queue in scene order
+        (None ends the stream) and each scene is encoded as soon as it arrives, at most
+        self.workers at a time, so encoding overlaps the remaining downloads.
+        """
+        specs = self.build_specs(scenes, prefix=Path(output_path).stem)
+        segment_paths = [None] * len(specs)
+        keys = {}
+        rendered = []
+        text_engine = TextEngine(context=self.compositor.context)
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.workers)
+        tasks = []
+
+        async def encode(spec):
+            try:
+                path = await loop.run_in_executor(pool, render_segment, spec)
+            finally:
+                slots.release()
+            segment_paths[spec["index"]] = path
+            rendered.append((spec, path))
+
+        pool = ProcessPoolExecutor(max_workers=self.workers)
+        try:
+            while True:
+                item = await ready.get()
+                if item is None:
+                    break
+                index, image_path = item
+                spec = specs[index]
+                spec["scene"]["image"] = str(image_path)
+
+                if self.cache:
+                    keys[index] = self.segment_key(spec, text_engine)
+                    cached = self.cache.get(keys[index])
+                    if cached:
+                        segment_paths[index] = str(cached)
+                        continue
+
+                # Not pulling the next scene while every worker is busy keeps the queue bounded
+                await slots.acquire()
+                tasks.append(asyncio.create_task(encode(spec)))
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Waiting for running encodes here would block the event loop when the job is cancelled
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        missing = [i for i, path in enumerate(segment_paths) if path is None]
+        if missing:
+            raise RuntimeError(f"Scene stream ended before scenes {missing} were ready")
+        logger.info(f"Streamed render: {len(rendered)}/{len(specs)} scenes encoded, the rest from cache.")
+        return self._join(segment_paths, rendered, keys, output_path)
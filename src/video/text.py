@@ -2,15 +2,47 @@ from moviepy.editor import ImageClip, CompositeVideoClip
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
 import textwrap
+import threading
+from collections import OrderedDict
+from functools import lru_cache
 from ..utils.logger import logger
 from ..utils.config import Config
+from ..utils.context import JobContext
+
+@lru_cache(maxsize=32)
+def load_font(font_path: str, fontsize: int):
+    """
+    Loads (once per path/size) a TrueType font, falling back to PIL's default font.
+    """
+    try:
+        return ImageFont.truetype(font_path, fontsize)
+    except IOError:
+        logger.warning(f"Font {font_path} not found, using default.")
+        return ImageFont.load_default()
 
 class TextEngine:
-    def __init__(self, font_name=None, fontsize=70, color="white", stroke_color="black", stroke_width=4):
-        self.fontsize = fontsize
+    # Rendered caption bitmaps (RGBA arrays) keyed on text + style, shared by all instances
+    _bitmap_cache = OrderedDict()
+    # LRU updates are not atomic; parallel Streamlit sessions render captions from several threads
+    _bitmap_lock = threading.Lock()
+    BITMAP_CACHE_SIZE = 512
+    # Word-timed captions: a silence this long (seconds) starts a new chunk, no chunk stays
+    # on screen longer than MAX_CAPTION_DURATION, and a chunk followed by a pause lingers a bit
+    PAUSE_BREAK = 0.35
+    MAX_CAPTION_DURATION = 2.5
+    CAPTION_LINGER = 0.4
+
+    def __init__(self, font_name=None, fontsize=70, color="white", stroke_color="black", stroke_width=4,
+                 context: JobContext = None):
+        self.context = context or JobContext.default()
+        # Sizes are given for the full-resolution frame and scaled to the job's (e.g. draft) width
+        scale = self.context.width / Config.VIDEO_WIDTH
+        self.fontsize = max(round(fontsize * scale), 1)
         self.color = color
         self.stroke_color = stroke_color
-        self.stroke_width = stroke_width
+        self.stroke_width = round(stroke_width * scale)
+        # Captions keep a margin inside the job's frame width
+        self.max_width = self.context.width - round(150 * scale)
         
         # Load custom font if available
         self.font_path = self._find_font(font_name)
@@ -18,12 +50,12 @@ class TextEngine:
     def _find_font(self, font_name):
         """Finds any .ttf file in assets/fonts or uses default"""
         if font_name:
-             specific_path = Config.FONTS_DIR / font_name
+             specific_path = self.context.fonts_dir / font_name
              if specific_path.exists():
                  return str(specific_path)
 
         # Search for any .ttf
-        fonts = list(Config.FONTS_DIR.glob("*.ttf"))
+        fonts = list(self.context.fonts_dir.glob("*.ttf"))
         if fonts:
             logger.info(f"Using custom font: {fonts[0].name}")
             return str(fonts[0])
@@ -35,12 +67,8 @@ class TextEngine:
         Creates a PIL Image with the text drawn on transparency.
         """
         try:
-            # Try to load font, fallback to default if not found
-            try:
-                font = ImageFont.truetype(self.font_path, self.fontsize)
-            except IOError:
-                logger.warning(f"Font {self.font_path} not found, using default.")
-                font = ImageFont.load_default()
+            # Cached per (path, size); falls back to default if not found
+            font = load_font(self.font_path, self.fontsize)
             
             # Wrap text
             avg_char_width = self.fontsize * 0.5 # Adjusted for horror fonts which might be narrow
@@ -84,14 +112,9 @@ class TextEngine:
                 # 1. Drop Shadow (Hard shadow for now)
                 draw.text((x_offset + shadow_offset, y_offset + shadow_offset), line, font=font, fill="black")
 
-                # 2. Outline/Stroke
-                if self.stroke_width > 0:
-                    for adj in range(-self.stroke_width, self.stroke_width+1):
-                        for adj2 in range(-self.stroke_width, self.stroke_width+1):
-                             draw.text((x_offset+adj, y_offset+adj2), line, font=font, fill=self.stroke_color)
-
-                # 3. Main Text
-                draw.text((x_offset, y_offset), line, font=font, fill=self.color)
+                # 2. Outline/Stroke + 3. Main Text in one pass (Pillow's native stroke)
+                draw.text((x_offset, y_offset), line, font=font, fill=self.color,
+                          stroke_width=self.stroke_width, stroke_fill=self.stroke_color)
                 
                 y_offset += h + line_spacing
                 
@@ -101,15 +124,44 @@ class TextEngine:
             logger.error(f"Error creating PIL text image: {e}")
             return None
 
+    def render_caption(self, text: str, max_width: int = None) -> np.ndarray:
+        """
+        Returns the caption as a read-only RGBA array, rendering it only on a cache miss.
+        """
+        if max_width is None:
+            max_width = self.max_width
+        key = (text, self.font_path, self.fontsize, self.color, self.stroke_color, self.stroke_width, max_width)
+
+        cache = TextEngine._bitmap_cache
+        with TextEngine._bitmap_lock:
+            bitmap = cache.get(key)
+            if bitmap is not None:
+                cache.move_to_end(key)
+                return bitmap
+
+        # Rendered outside the lock; two threads missing the same key just render it twice
+        pil_img = self._create_pil_text_image(text, max_width=max_width)
+        if pil_img is None:
+            return None
+
+        bitmap = np.array(pil_img)
+        bitmap.setflags(write=False)
+        with TextEngine._bitmap_lock:
+            cache[key] = bitmap
+            cache.move_to_end(key)
+            if len(cache) > self.BITMAP_CACHE_SIZE:
+                cache.popitem(last=False)
+        return bitmap
+
     def create_caption_clip(self, text: str, duration: float) -> ImageClip:
         """
         Creates a single text clip for a specific duration using PIL.
         """
-        pil_img = self._create_pil_text_image(text, max_width=Config.VIDEO_WIDTH - 150)
+        bitmap = self.render_caption(text)
         
-        if pil_img:
+        if bitmap is not None:
             # Position captions near the center for better focus on-screen
-            return ImageClip(np.array(pil_img)).set_duration(duration).set_position(('center', 'center'), relative=True).crossfadein(0.1)
+            return ImageClip(bitmap).set_duration(duration).set_position(('center', 'center'), relative=True).crossfadein(0.1)
         
         return None
 
@@ -122,82 +174,110 @@ class TextEngine:
 
     def generate_subtitles(self, scenes: list) -> list:
         """
-        Generates a list of TextClips synced to the scenes.
-        Splits long sentences into smaller chunks (Karaoke style).
+        Generates a list of caption clips for the whole video (Karaoke style), with absolute
+        start times. Uses the scenes' spoken 'words' when available, otherwise chunk durations
+        are estimated from the character count of each scene.
         """
-        clips = []
-        for scene in scenes:
-            full_text = scene.get("text", "")
-            total_duration = scene.get("duration", 2)
-            
-            # Split into chunks
-            chunks = self.split_text_into_chunks(full_text, max_words=5)
-            if not chunks:
-                continue
-                
-            # Calculate duration per chunk based on character count
-            total_chars = len(full_text.replace(" ", ""))
-            if total_chars == 0: total_chars = 1
-            
-            start_time = 0 # Relative to scene start
-            
-            for chunk in chunks:
-                chunk_chars = len(chunk.replace(" ", ""))
-                # Proportional duration
-                chunk_duration = (chunk_chars / total_chars) * total_duration
-                
-                # Create clip
-                clip = self.create_caption_clip(chunk, chunk_duration)
-                if clip:
-                    # We need to set the start time relative to the sequence if we were using CompositeVideo as a whole
-                    # But here we are returning a list of clips to be concatenated?
-                    # No, TextEngine.generate_subtitles returns a list of clips. 
-                    # The caller (composer.py) iterates zip(video_clips, scenes).
-                    # Composer expects ONE clip that lasts the whole scene OR needs to composite multiple.
-                    
-                    # Wait! Composer.py logic:
-                    # txt_clip = text_engine.create_caption_clip(text, clip.duration)
-                    # composite = CompositeVideoClip([clip, txt_clip])
-                    
-                    # We need to change Composer to handle a LIST of text clips for one scene.
-                    # Or we return a single CompositeVideoClip containing all the text chunks properly timed.
-                    
-                    clip = clip.set_start(start_time)
-                    clips.append(clip)
-                
-                start_time += chunk_duration
+        words = [word for scene in scenes for word in scene.get("words") or []]
+        if words:
+            timings = [(chunk, start, end - start) for chunk, start, end in self.word_caption_timings(words)]
+        else:
+            timings = []
+            scene_start = 0
+            for scene in scenes:
+                duration = scene.get("duration", 2)
+                for chunk, start, chunk_duration in self.caption_timings(scene.get("text", ""), duration):
+                    timings.append((chunk, scene_start + start, chunk_duration))
+                scene_start += duration
 
-        # This return logic is now broken for the current Composer implementation.
-        # The current Composer expects `create_caption_clip` to return one clip.
-        # We need to update `generate_scenes_with_text` logic in Composer or return a Composite here.
+        clips = []
+        for chunk, start, duration in timings:
+            clip = self.create_caption_clip(chunk, duration)
+            if clip:
+                clips.append(clip.set_start(start))
         return clips
         
-    def create_karaoke_clip(self, text: str, total_duration: float) -> CompositeVideoClip:
+    def caption_timings(self, text: str, total_duration: float, max_words=5) -> list[tuple]:
         """
-        Creates a CompositeVideoClip containing the sequence of chunked text clips.
+        Splits text into karaoke chunks timed proportionally to their character count.
+        Returns [(chunk, start, duration)] relative to the start of the text.
         """
-        chunks = self.split_text_into_chunks(text, max_words=5)
-        if not chunks:
-            return None
-            
+        chunks = self.split_text_into_chunks(text, max_words=max_words)
+        
         total_chars = len(text.replace(" ", ""))
         if total_chars == 0: total_chars = 1
         
-        text_clips = []
+        timings = []
         current_time = 0
         
         for chunk in chunks:
             chunk_chars = len(chunk.replace(" ", ""))
             chunk_duration = (chunk_chars / total_chars) * total_duration
+            timings.append((chunk, current_time, chunk_duration))
+            current_time += chunk_duration
             
+        return timings
+
+    def word_caption_timings(self, words: list[dict], max_words=5, pause: float = None,
+                             max_duration: float = None) -> list[tuple]:
+        """
+        Groups timed words ({"text", "start", "end"}, e.g. from TTS WordBoundary events) into
+        karaoke chunks for the whole narration in one pass.
+        A chunk ends after `max_words` words, at a pause of at least `pause` seconds, or before
+        it would stay on screen longer than `max_duration`. Each chunk is shown until the next
+        one starts (or, after a pause, briefly past its last word).
+        Returns [(chunk, start, end)] on the words' time base.
+        """
+        pause = self.PAUSE_BREAK if pause is None else pause
+        max_duration = self.MAX_CAPTION_DURATION if max_duration is None else max_duration
+
+        groups = []
+        current = []
+        for word in words:
+            if current and (
+                len(current) >= max_words
+                or word["start"] - current[-1]["end"] >= pause
+                or word["end"] - current[0]["start"] > max_duration
+            ):
+                groups.append(current)
+                current = []
+            current.append(word)
+        if current:
+            groups.append(current)
+
+        timings = []
+        for i, group in enumerate(groups):
+            start = group[0]["start"]
+            end = group[-1]["end"] + self.CAPTION_LINGER
+            if i + 1 < len(groups):
+                next_start = groups[i + 1][0]["start"]
+                # Back to back speech: hand over directly; after a pause: linger, never overlap
+                end = next_start if next_start - group[-1]["end"] < pause else min(end, next_start)
+            end = min(end, start + max_duration)
+            timings.append((" ".join(word["text"] for word in group), start, max(end, group[-1]["end"])))
+        return timings
+
+    def create_karaoke_clip(self, text: str, total_duration: float, words: list[dict] = None) -> CompositeVideoClip:
+        """
+        Creates a CompositeVideoClip containing the sequence of chunked text clips.
+        With `words` (times relative to the clip start), chunks follow the actual speech.
+        """
+        if words:
+            timings = [(chunk, start, end - start) for chunk, start, end in self.word_caption_timings(words)]
+        else:
+            timings = self.caption_timings(text, total_duration, max_words=5)
+        if not timings:
+            return None
+        
+        text_clips = []
+        
+        for chunk, start_time, chunk_duration in timings:
             # Create the image clip
             img_clip = self.create_caption_clip(chunk, chunk_duration)
             if img_clip:
-                img_clip = img_clip.set_start(current_time)
+                img_clip = img_clip.set_start(start_time)
                 text_clips.append(img_clip)
             
-            current_time += chunk_duration
-            
         if not text_clips:
             return None
             
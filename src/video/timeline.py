@@ -0,0 +1,99 @@
+from bisect import bisect_right
+import numpy as np
+from moviepy.editor import VideoClip
+from .effects import VignetteFilter
+from .kenburns import KenBurnsEngine
+
+class CaptionLayer:
+    """
+    A pre-rendered RGBA caption shown centered on screen between `start` and `end`
+    (seconds, relative to its scene), fading in over `fade_in` seconds.
+    """
+    def __init__(self, bitmap: np.ndarray, start: float, end: float, fade_in: float = 0.1):
+        self.start = start
+        self.end = end
+        self.fade_in = fade_in
+        self.height, self.width = bitmap.shape[:2]
+
+        # Fixed-point alpha (0..256) and premultiplied color, so blending is integer-only
+        self.alpha = np.round(bitmap[:, :, 3:4].astype(np.float32) * 256 / 255).astype(np.uint16)
+        self.inv_alpha = 256 - self.alpha
+        self.rgb = bitmap[:, :, :3].astype(np.uint16)
+        self.premultiplied = self.rgb * self.alpha
+
+    def is_visible(self, t: float) -> bool:
+        return self.start <= t < self.end
+
+    def draw(self, frame: np.ndarray, t: float):
+        """
+        Alpha-blends the caption into `frame` in place.
+        """
+        frame_h, frame_w = frame.shape[:2]
+        x = (frame_w - self.width) // 2
+        y = (frame_h - self.height) // 2
+
+        # Clip to the frame (captions can be wider than a narrow frame)
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + self.width, frame_w), min(y + self.height, frame_h)
+        if x0 >= x1 or y0 >= y1:
+            return
+        region = frame[y0:y1, x0:x1]
+        src = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+
+        fade = (t - self.start) / self.fade_in if self.fade_in > 0 else 1.0
+        if fade >= 1.0:
+            blended = region * self.inv_alpha[src] + self.premultiplied[src]
+        else:
+            alpha = (self.alpha[src] * max(fade, 0.0)).astype(np.uint16)
+            blended = region * (256 - alpha) + self.rgb[src] * alpha
+        region[...] = blended >> 8
+
+class SceneLayer:
+    """
+    One scene on the timeline: a Ken Burns background plus its timed captions.
+    """
+    def __init__(self, start: float, duration: float, background: KenBurnsEngine, captions: list = None):
+        self.start = start
+        self.duration = duration
+        self.background = background
+        self.captions = captions or []
+
+class Timeline:
+    """
+    Flat, single-pass renderer for a sequence of scenes.
+    One frame function draws background, vignette and captions straight into a reused
+    buffer, replacing nested CompositeVideoClips and double concatenation.
+    """
+    def __init__(self, scenes: list, size: tuple, fps: int, vignette_opacity: float = None):
+        self.scenes = scenes
+        self.width, self.height = size
+        self.fps = fps
+        self.starts = [scene.start for scene in scenes]
+        self.duration = scenes[-1].start + scenes[-1].duration if scenes else 0.0
+        self.vignette = VignetteFilter(self.width, self.height, vignette_opacity) if vignette_opacity else None
+        self._frame = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+
+    def scene_at(self, t: float) -> SceneLayer:
+        index = min(max(bisect_right(self.starts, t) - 1, 0), len(self.scenes) - 1)
+        return self.scenes[index]
+
+    def make_frame(self, t: float) -> np.ndarray:
+        """
+        Renders the frame at time `t`. The returned buffer is reused by the next call.
+        """
+        scene = self.scene_at(t)
+        local_t = t - scene.start
+
+        background = scene.background.get_frame(local_t)
+        if self.vignette:
+            self.vignette.apply(background, out=self._frame)
+        else:
+            np.copyto(self._frame, background)
+
+        for caption in scene.captions:
+            if caption.is_visible(local_t):
+                caption.draw(self._frame, local_t)
+        return self._frame
+
+    def to_clip(self) -> VideoClip:
+        return VideoClip(make_frame=self.make_frame, duration=self.duration)
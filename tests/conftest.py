@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# Tests import the app the same way main.py/app.py do: `from src...` relative to the repo root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,37 @@
+import asyncio
+import pytest
+from src.generators.audio import AudioGenerator
+from src.utils.config import Config
+
+class FakeCommunicate:
+    calls = 0
+
+    async def stream(self):
+        FakeCommunicate.calls += 1
+        yield {"type": "audio", "data": b"mp3"}
+        yield {"type": "WordBoundary", "offset": 0, "duration": 10, "text": "boo"}
+
+@pytest.fixture
+def generator(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(Config, "TTS_CACHE_ENABLED", True)
+    monkeypatch.setattr(AudioGenerator, "_communicate", lambda self, text: FakeCommunicate())
+    FakeCommunicate.calls = 0
+    generator = AudioGenerator()
+    generator.output_dir = tmp_path
+    return generator
+
+def test_cached_mp3_without_boundaries_is_resynthesized(generator, tmp_path):
+    asyncio.run(generator._synthesize("boo", tmp_path / "a.mp3"))
+    key = generator.cache.make_key("boo", generator.voice, generator.rate, generator.pitch)
+    generator.cache._meta_path(key).write_text("{not json")
+
+    boundaries = asyncio.run(generator._synthesize("boo", tmp_path / "b.mp3"))
+    assert boundaries == [{"offset": 0, "duration": 10, "text": "boo"}]
+    assert FakeCommunicate.calls == 2
+    assert generator.cache.hits == 0
+    assert generator.cache.get_meta(key) == {"word_boundaries": boundaries}
+
+    asyncio.run(generator._synthesize("boo", tmp_path / "c.mp3"))
+    assert FakeCommunicate.calls == 2
+    assert generator.cache.hits == 1
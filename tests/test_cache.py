@@ -0,0 +1,29 @@
+import json
+import time
+import pytest
+from src.generators.script import ScriptGenerator
+from src.utils.cache import DiskCache
+from src.utils.config import Config
+
+@pytest.fixture(autouse=True)
+def cache_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "CACHE_DIR", tmp_path)
+
+def test_rejected_entry_is_a_miss_and_falls_back():
+    cache = DiskCache("test", suffix=".txt")
+    cache.put_bytes("stale", b"old")
+    cache.put_bytes("fresh", b"new")
+
+    path = cache.get("stale", "fresh", valid=lambda key, path: key != "stale")
+    assert path.read_bytes() == b"new"
+    assert cache.get("stale", valid=lambda key, path: False) is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+def test_expired_llm_response_is_not_a_hit(monkeypatch):
+    generator = ScriptGenerator(use_cache=True)
+    key = generator._cache_key(generator.models[0], "prompt")
+    entry = {"model": generator.models[0], "response": "story", "created": time.time() - Config.LLM_CACHE_TTL - 1}
+    generator.cache.put_bytes(key, json.dumps(entry).encode("utf-8"))
+
+    assert generator._cache_lookup("prompt") is None
+    assert generator.cache.hits == 0
@@ -0,0 +1,27 @@
+import sys
+import numpy as np
+import pytest
+from src.video.ffmpeg_writer import FFmpegPipeWriter
+
+# Stand-in for ffmpeg that floods stderr (well past the pipe buffer) before reading its input
+NOISY_ENCODER = (
+    "import sys\n"
+    "for i in range(20000): sys.stderr.write(f'warning {i}: lorem ipsum dolor\\n')\n"
+    "sys.stderr.flush()\n"
+    "n = len(sys.stdin.buffer.read())\n"
+    "sys.exit(0 if n else 3)\n"
+)
+
+def writer_for(tmp_path, script):
+    writer = FFmpegPipeWriter(tmp_path / "out.mp4", (16, 16), 4, queue_size=2)
+    writer.command = [sys.executable, "-c", script]
+    return writer
+
+def test_verbose_stderr_does_not_block_the_pipe(tmp_path):
+    frames = (np.zeros((16, 16, 3), dtype=np.uint8) for _ in range(200))
+    assert writer_for(tmp_path, NOISY_ENCODER).write_frames(frames) == str(tmp_path / "out.mp4")
+
+def test_failure_reports_the_end_of_stderr(tmp_path):
+    script = NOISY_ENCODER.replace("sys.exit(0 if n else 3)", "sys.stderr.write('fatal: bad input\\n'); sys.exit(1)")
+    with pytest.raises(IOError, match="fatal: bad input"):
+        writer_for(tmp_path, script).write_frames(np.zeros((16, 16, 3), dtype=np.uint8) for _ in range(2))
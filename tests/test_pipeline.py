@@ -0,0 +1,49 @@
+import asyncio
+import pytest
+from src import pipeline
+from src.utils.config import Config
+from src.utils.manifest import JobManifest
+
+class StreamDropped(Exception):
+    pass
+
+@pytest.fixture
+def job(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, "JOBS_DIR", tmp_path / "jobs")
+    monkeypatch.setattr(Config, "CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(Config, "IMAGE_CACHE_ENABLED", False)
+    Config.JOBS_DIR.mkdir()
+    return JobManifest.create("A cursed phone number")
+
+def test_failed_script_stream_is_not_checkpointed(job, monkeypatch):
+    narrated = []
+
+    async def broken_stream(self, topic=None, **kwargs):
+        for i in range(3):
+            yield {"text": f"Sentence {i}.", "image_prompt": f"Prompt {i}"}
+            await asyncio.sleep(0)
+        raise StreamDropped("connection dropped after 3 scenes")
+
+    async def slow_image(self, prompt, index, session=None):
+        # Still downloading when the script stream fails
+        await asyncio.sleep(0.05)
+        image_path = job.path(f"scene_{index}.jpg")
+        image_path.write_bytes(b"jpeg")
+        return str(image_path)
+
+    async def narration(self, text, filename="narration"):
+        narrated.append(text)
+        raise AssertionError("narration started for a partial script")
+
+    monkeypatch.setattr(pipeline.ScriptGenerator, "generate_script_stream", broken_stream)
+    monkeypatch.setattr(pipeline.ImageGenerator, "generate_image", slow_image)
+    monkeypatch.setattr(pipeline.AudioGenerator, "generate_narration", narration)
+
+    with pytest.raises(StreamDropped):
+        asyncio.run(pipeline.generate_assets(job, report=lambda message: None))
+
+    resumed = JobManifest.load(job.job_id)
+    assert not resumed.is_complete("script")
+    assert resumed.artifact("script", "script") is None
+    assert not job.path("script.json").exists()
+    assert narrated == []